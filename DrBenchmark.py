@@ -0,0 +1,260 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from typing import List, Callable, Optional
+
+from DrSegment import SRTGenerator, WordTimings
+
+
+def best_of(func: Callable[[], object], repeats: int) -> float:
+    """Returnerer den hurtigste af flere kørsler i sekunder"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def synthetic_timings(n_tokens: int, comma_every: int = 0) -> WordTimings:
+    """Bygger et kunstigt segment med n_tokens ord (og evt. et komma efter hvert comma_every ord)"""
+    timings = WordTimings()
+    t = 0.0
+    for i in range(n_tokens):
+        timings.append("ord", t, t + 0.3)
+        t += 0.35
+        if comma_every and i % comma_every == comma_every - 1:
+            timings.append(",", t, t, punctuation=True, attached=True)
+    return timings
+
+
+class _Token:
+    __slots__ = ("i", "dep_")
+
+    def __init__(self, i: int, dep: str):
+        self.i = i
+        self.dep_ = dep
+
+
+class _SyntheticParser:
+    """Parser-attrap der markerer hvert fjerde ord som ledsætningsmarkør, så kun kandidatsøgningen måles"""
+    def __call__(self, text: str) -> List[_Token]:
+        return [_Token(i, "mark" if i % 4 == 0 else "nsubj") for i in range(len(text.split()))]
+
+
+class _BenchGenerator(SRTGenerator):
+    nlp = _SyntheticParser()
+
+
+def bench_candidates(sizes: List[int], repeats: int) -> bool:
+    """Måler _find_split_candidates på komma-tætte og kommaløse segmenter af stigende længde"""
+    generator = _BenchGenerator()
+    rows = []
+
+    print(f"{'tokens':>8} {'komma (ms)':>12} {'µs/token':>10} {'syntaks (ms)':>14} {'µs/token':>10}")
+    for n in sizes:
+        comma_timings = synthetic_timings(n, comma_every=3)
+        syntax_timings = synthetic_timings(n)
+        t_comma = best_of(lambda: generator._find_split_candidates(comma_timings), repeats)
+        t_syntax = best_of(lambda: generator._find_split_candidates(syntax_timings), repeats)
+        rows.append((n, t_comma, t_syntax))
+        print(f"{n:>8} {t_comma * 1e3:>12.2f} {t_comma / n * 1e6:>10.2f} "
+              f"{t_syntax * 1e3:>14.2f} {t_syntax / n * 1e6:>10.2f}")
+
+    # Ved lineær kørselstid er tiden pr. token nogenlunde konstant
+    first_n, first_comma, first_syntax = rows[0]
+    last_n, last_comma, last_syntax = rows[-1]
+    comma_growth = (last_comma / last_n) / (first_comma / first_n)
+    syntax_growth = (last_syntax / last_n) / (first_syntax / first_n)
+    print(f"\nVækst i tid pr. token fra {first_n} til {last_n} tokens: "
+          f"komma {comma_growth:.2f}x, syntaks {syntax_growth:.2f}x (≈1 betyder lineær)")
+
+    # Kvadratisk kørselstid ville give vækst i størrelsesordenen last_n / first_n
+    limit = 2.0
+    linear = comma_growth < limit and syntax_growth < limit
+    print("Lineær: JA" if linear else f"Lineær: NEJ (vækst over {limit:.1f}x)")
+    return linear
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil efter nearest-rank metoden"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def synthetic_subtitles(n: int) -> List[str]:
+    """Bygger n undertekster der er for lange til to linjer, nogle med fortsættelsesstreger"""
+    words = "det er vigtigt at vi taler om fremtiden og hvad der sker når vi alle sammen".split()
+    texts = []
+    for i in range(n):
+        text = " ".join(words[(i + k) % len(words)] for k in range(22)) + f" nummer {i}."
+        if i % 3 == 1:
+            text = "- " + text
+        if i % 3 == 0:
+            text = text[:-1] + " -"
+        texts.append(text)
+    return texts
+
+
+def bench_condense(n_texts: int, concurrencies: List[int], latency_ms: float, rate_limit_prob: float,
+                   prompt_batch_size: int) -> bool:
+    """Måler condense_text_batch mod den lokale Azure-attrap ved forskellige samtidighedsgrader"""
+    # DrKondens kræver openai, så den indlæses kun når benchmarken bruges
+    from DrMockAzure import MockConfig, start_server
+    import DrKondens
+
+    server = start_server(MockConfig(latency_ms=latency_ms, rate_limit_prob=rate_limit_prob))
+    os.environ["OPENAI_AZURE_ENDPOINT"] = server.endpoint
+    os.environ["OPENAI_AZURE_API_KEY"] = "mock"
+    texts = synthetic_subtitles(n_texts)
+
+    class TimedCondenser(DrKondens.TextCondenser):
+        """Måler svartiden pr. undertekst (i samlede kald får alle tekster kaldets svartid)"""
+        def __init__(self, config):
+            super().__init__(config)
+            self.latencies = []
+
+        def condense_text(self, text, progress_callback=None, lookup=True):
+            start = time.perf_counter()
+            try:
+                return super().condense_text(text, progress_callback, lookup)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+
+        def get_condensations_batched(self, batch_texts, temperature):
+            start = time.perf_counter()
+            try:
+                return super().get_condensations_batched(batch_texts, temperature)
+            finally:
+                self.latencies.extend([time.perf_counter() - start] * len(batch_texts))
+
+    print(f"{n_texts} undertekster, median svartid {latency_ms:.0f} ms, 429-andel {rate_limit_prob:.0%}, "
+          f"prompt_batch_size {prompt_batch_size}\n")
+    print(f"{'samtidig':>8} {'tid (s)':>8} {'tekster/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'kald':>6} {'429':>5} {'genforsøg':>9} {'uændret':>8}")
+    ok = True
+    try:
+        for concurrency in concurrencies:
+            config = DrKondens.CondensationConfig(
+                chars_per_line=37,
+                max_concurrency=concurrency,
+                prompt_batch_size=prompt_batch_size,
+                cache_path=None,  # Cachen ville gøre alle kørsler efter den første gratis
+                local_condensation=False,
+                requests_per_minute=100000,  # Attrappen har ingen kvote ud over 429-injektionen
+                tokens_per_minute=10000000
+            )
+            condenser = TimedCondenser(config)
+            server.stats.reset()
+            retries_before = condenser.scheduler.retries
+            start = time.perf_counter()
+            try:
+                result = condenser.condense_text_batch(texts)
+            finally:
+                condenser.close()
+            elapsed = time.perf_counter() - start
+
+            unchanged = sum(1 for original, condensed in zip(texts, result) if original == condensed)
+            ok = ok and unchanged == 0
+            latencies = [latency * 1000 for latency in condenser.latencies]
+            print(f"{concurrency:>8} {elapsed:>8.2f} {n_texts / elapsed:>10.1f} "
+                  f"{percentile(latencies, 50):>9.0f} {percentile(latencies, 99):>9.0f} "
+                  f"{server.stats.requests:>6} {server.stats.rate_limited:>5} "
+                  f"{condenser.scheduler.retries - retries_before:>9} {unchanged:>8}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("\nAlle undertekster kondenseret: JA" if ok else "\nAlle undertekster kondenseret: NEJ")
+    return ok
+
+
+def bench_audio(input_path: Optional[str], profiles: List[str], upload_mbps: float, duration_sec: int) -> bool:
+    """Sammenligner lydprofiler på filstørrelse, konverteringstid og anslået uploadtid"""
+    # DrGenkend kræver speechmatics, så den indlæses kun når benchmarken bruges
+    from DrGenkend import AudioConverter, AUDIO_PROFILES
+
+    ffmpeg_path = AudioConverter.find_ffmpeg()
+    if not ffmpeg_path:
+        print("ffmpeg ikke fundet")
+        return False
+
+    work_dir = tempfile.mkdtemp(prefix="drbench_audio_")
+    try:
+        if input_path is None:
+            # Syntetisk 44,1 kHz stereo-signal med støj, så komprimeringen ikke bliver urealistisk god
+            input_path = os.path.join(work_dir, "syntetisk.wav")
+            subprocess.run([
+                ffmpeg_path, "-f", "lavfi", "-i", f"anoisesrc=d={duration_sec}:c=pink:a=0.1:r=44100",
+                "-f", "lavfi", "-i", f"sine=f=220:d={duration_sec}:r=44100",
+                "-filter_complex", "amix=inputs=2", "-ac", "2", "-acodec", "pcm_s16le", "-y", input_path
+            ], capture_output=True, check=True)
+
+        print(f"Input: {input_path} ({os.path.getsize(input_path) / 1e6:.1f} MB), upload {upload_mbps:.0f} Mbit/s\n")
+        print(f"{'profil':>8} {'MB':>8} {'andel':>7} {'konvertering (s)':>17} {'upload (s)':>11} {'i alt (s)':>10}")
+
+        reference = None
+        ok = True
+        for profile in profiles:
+            output_path = os.path.join(work_dir, "output" + AUDIO_PROFILES[profile].suffix)
+            start = time.perf_counter()
+            result = AudioConverter.convert_audio(input_path, profile, output_path=output_path)
+            convert_sec = time.perf_counter() - start
+            if not result:
+                print(f"{profile:>8} konvertering fejlede")
+                ok = False
+                continue
+
+            size = os.path.getsize(result)
+            reference = reference or size
+            upload_sec = size * 8 / (upload_mbps * 1e6)
+            print(f"{profile:>8} {size / 1e6:>8.2f} {size / reference:>7.1%} {convert_sec:>17.2f} "
+                  f"{upload_sec:>11.2f} {convert_sec + upload_sec:>10.2f}")
+            os.remove(result)
+        return ok
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Mikrobenchmarks for Dr. Gensyn")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    candidates = subparsers.add_parser("candidates", help="Kandidatsøgning i _find_split_candidates")
+    candidates.add_argument("--sizes", type=int, nargs="+", default=[500, 1000, 2000, 4000, 8000])
+    candidates.add_argument("--repeats", type=int, default=5)
+
+    condense = subparsers.add_parser("condense", help="condense_text_batch mod en lokal Azure OpenAI-attrap")
+    condense.add_argument("--texts", type=int, default=200)
+    condense.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    condense.add_argument("--latency-ms", type=float, default=300.0)
+    condense.add_argument("--rate-limit-prob", type=float, default=0.02)
+    condense.add_argument("--prompt-batch-size", type=int, default=1)
+
+    audio = subparsers.add_parser("audio", help="Lydprofiler i DrGenkend: størrelse, konvertering og upload")
+    audio.add_argument("input", nargs="?", help="Video- eller lydfil (udelades: syntetisk signal)")
+    audio.add_argument("--profiles", nargs="+", default=["wav44k", "wav16k", "flac16k", "opus"])
+    audio.add_argument("--upload-mbps", type=float, default=50.0)
+    audio.add_argument("--duration", type=int, default=600, help="Længde af det syntetiske signal i sekunder")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "candidates":
+        return 0 if bench_candidates(args.sizes, args.repeats) else 1
+    if args.command == "audio":
+        return 0 if bench_audio(args.input, args.profiles, args.upload_mbps, args.duration) else 1
+    if args.command == "condense":
+        return 0 if bench_condense(args.texts, args.concurrency, args.latency_ms,
+                                   args.rate_limit_prob, args.prompt_batch_size) else 1
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
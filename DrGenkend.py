@@ -1,24 +1,57 @@
 import os
+import re
 import json
+import time
+import hashlib
 import subprocess
-import logging
 import sys
-from typing import Optional, Dict, Any, Callable
+import threading
+import bisect
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, Callable, Tuple, List
 from dataclasses import dataclass
 from speechmatics.models import ConnectionSettings
 from speechmatics.batch_client import BatchClient
+from speechmatics.exceptions import JobNotFoundException
 from httpx import HTTPStatusError
+from DrPaths import data_path
+from DrLog import get_logger, setup_logging
 
-# Opsæt logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('drgenkend.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger('DrGenkend')
+# Niveauet kan sættes pr. modul, fx DRGENKEND_LOG_LEVEL=DEBUG for at følge jobs og uploads
+logger = get_logger('DrGenkend')
+
+@dataclass(frozen=True)
+class AudioProfile:
+    """Lydformat der sendes til Speechmatics"""
+    suffix: str  # Tilføjes inputfilens navn uden endelse, fx "_16k.flac"
+    codec_args: Tuple[str, ...]  # ffmpeg-argumenter for codec, samplerate og kanaler
+    container: str  # ffmpeg-format ved output til en pipe
+    streamable: bool = False  # Kan skrives til en pipe uden at ffmpeg skal rette headeren bagefter
+
+# Talegenkendelse har ikke gavn af mere end 16 kHz mono, så de mindre profiler
+# giver samme resultat med en brøkdel af disk-I/O og upload
+AUDIO_PROFILES = {
+    "wav44k": AudioProfile(".wav", ("-acodec", "pcm_s16le", "-ar", "44100", "-ac", "2"), "wav"),  # Oprindeligt format
+    "wav16k": AudioProfile("_16k.wav", ("-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1"), "wav"),
+    "flac16k": AudioProfile("_16k.flac", ("-acodec", "flac", "-ar", "16000", "-ac", "1"), "flac", True),
+    "opus": AudioProfile("_16k.ogg", ("-acodec", "libopus", "-b:a", "32k", "-ar", "16000", "-ac", "1",
+                                      "-application", "voip"), "ogg", True),
+}
+DEFAULT_AUDIO_PROFILE = "flac16k"
+STREAM_FALLBACK_PROFILE = "opus"  # Bruges ved streaming hvis den valgte profil ikke kan streames
+
+# Opdeling af lange optagelser
+SILENCE_NOISE_DB = -35  # Under dette niveau regnes lyden som stilhed
+SILENCE_MIN_SEC = 0.4  # Korteste pause der kan bruges som snitpunkt
+CHUNK_TAIL_SEC = 2.0  # Ekstra lyd efter snittet, så ord der starter lige før snittet ikke klippes over
+SPEAKER_MATCH_SEC = 0.5  # Største tidsforskel når samme ord i overlappet parres mellem to dele
+
+# Opfølgning på jobs
+POLL_INTERVAL_SEC = 10.0
+FAILED_JOB_STATUSES = {"rejected", "deleted", "expired"}
 
 @dataclass
 class RecognitionConfig:
@@ -34,10 +67,20 @@ class RecognitionConfig:
     speaker_sensitivity: Optional[float] = None
     punctuation_sensitivity: Optional[float] = None
     volume_threshold: Optional[float] = None
+    audio_profile: str = DEFAULT_AUDIO_PROFILE  # Nøgle i AUDIO_PROFILES - sendes ikke til Speechmatics
+    stream_upload: bool = True  # Send ffmpegs output direkte til Speechmatics uden en lydfil på disken
+    transcript_cache_dir: Optional[str] = "drgenkend_cache"  # Relativ til datamappen (DrPaths); None slår cachen fra
+    transcript_cache_max_mb: float = 2000.0  # De mindst brugte transskriptioner slettes over denne grænse
+    chunk_minutes: Optional[float] = None  # Del optagelser længere end 1,5 gange dette i parallelle jobs (None = fra)
+    chunk_overlap_sec: float = 30.0  # Overlap mellem dele - talere afstemmes ud fra de ord der siges her
+    max_parallel_jobs: int = 4  # Højeste antal samtidige Speechmatics-jobs ved opdeling
+    job_store_path: Optional[str] = "drgenkend_jobs.json"  # Indsendte jobs gemmes her (relativ til datamappen), så de kan genoptages (None = fra)
     
     def __post_init__(self):
         if self.permitted_marks is None:
             self.permitted_marks = [",", ".", "?"]
+        if self.audio_profile not in AUDIO_PROFILES:
+            raise ValueError(f"Ukendt audio_profile: {self.audio_profile} (vælg mellem {', '.join(AUDIO_PROFILES)})")
     
     def to_dict(self) -> dict:
         """Konverterer config til Speechmatics format"""
@@ -81,8 +124,374 @@ class RecognitionConfig:
         }
 
 
+def media_fingerprint(path: str, sample_size: int = 1 << 20, samples: int = 16) -> str:
+    """
+    Hurtig indholdshash af en mediefil: blake2b over filstørrelsen og et antal jævnt fordelte blokke.
+    Filer op til samples * sample_size hashes fuldt ud, så kun store filer samples.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode("ascii"), digest_size=20)
+    with open(path, "rb") as f:
+        if size <= sample_size * samples:
+            for block in iter(lambda: f.read(sample_size), b""):
+                digest.update(block)
+        else:
+            step = (size - sample_size) // (samples - 1)
+            for i in range(samples):
+                f.seek(i * step)
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    Diskcache med json-v2 transskriptioner, så samme medie med samme konfiguration ikke sendes igen.
+    Nøglen er medieindholdets hash plus Speechmatics-konfigurationen som kanonisk JSON.
+    Hver transskription ligger i sin egen fil; filens mtime bruges som sidst brugt ved oprydning.
+    En relativ mappe lægges i brugerens datamappe.
+    """
+    VERSION = 1  # Hæves hvis formatet af de gemte transskriptioner ændres
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = data_path(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def make_key(cls, media_hash: str, config_dict: dict) -> str:
+        payload = json.dumps([cls.VERSION, media_hash, config_dict],
+                             sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+    @staticmethod
+    def make_chunk_key(key: str, chunk: "AudioChunk") -> str:
+        """Nøgle for én del af en opdelt transskription"""
+        payload = f"{key}:{chunk.start:.3f}:{chunk.end:.3f}"
+        return hashlib.blake2b(payload.encode("ascii"), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                transcript = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ugyldig post i transskriptionscachen ({path}): {e}")
+            return None
+        os.utime(path)  # Markér som sidst brugt
+        return transcript
+
+    def put(self, key: str, transcript: Dict[str, Any]):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(transcript, f, ensure_ascii=False)
+        os.replace(temp_path, path)  # Atomisk, så en afbrudt skrivning ikke efterlader en halv post
+        self.evict()
+
+    def evict(self):
+        """Sletter de mindst brugte transskriptioner indtil cachen er under max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+                logger.debug(f"Fjernede {path} fra transskriptionscachen")
+            except OSError as e:
+                logger.warning(f"Kunne ikke fjerne {path} fra transskriptionscachen: {e}")
+
+
+@dataclass
+class AudioChunk:
+    """En del af en lang optagelse. Ord der starter i [keep_from, keep_to) bruges fra denne del."""
+    index: int
+    start: float  # Hvor delens lyd starter (keep_from minus overlap)
+    keep_from: float
+    keep_to: float
+    end: float  # Hvor delens lyd slutter (keep_to plus CHUNK_TAIL_SEC)
+
+
+def plan_chunks(duration: float, silences: List[Tuple[float, float]], chunk_sec: float,
+                overlap_sec: float) -> List[AudioChunk]:
+    """
+    Deler en optagelse i dele på omkring chunk_sec. Hvert snit lægges midt i den pause der er
+    tættest på målet (inden for en fjerdedel af chunk_sec), ellers præcist ved målet.
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    cuts = [0.0]
+    # Den sidste del må gerne være op til 1,5 gange chunk_sec frem for at blive en lille rest
+    while duration - cuts[-1] > chunk_sec * 1.5:
+        target = cuts[-1] + chunk_sec
+        window = chunk_sec / 4
+        lo = bisect.bisect_left(midpoints, target - window)
+        hi = bisect.bisect_right(midpoints, target + window)
+        candidates = midpoints[lo:hi]
+        cuts.append(min(candidates, key=lambda c: abs(c - target)) if candidates else target)
+    cuts.append(duration)
+
+    return [
+        AudioChunk(
+            index=i,
+            start=max(0.0, cuts[i] - overlap_sec) if i else 0.0,
+            keep_from=cuts[i],
+            keep_to=cuts[i + 1],
+            end=min(duration, cuts[i + 1] + CHUNK_TAIL_SEC)
+        )
+        for i in range(len(cuts) - 1)
+    ]
+
+
+def _speaker(item: Dict[str, Any]) -> Optional[str]:
+    alternatives = item.get("alternatives") or [{}]
+    return alternatives[0].get("speaker")
+
+
+def _match_speakers(previous: List[Dict[str, Any]], overlap: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Finder hvilke af den nye dels talere der er de samme som i den forrige del. Ord i overlappet
+    parres på indhold og tid, og talerparrene tildeles grådigt efter hvor mange ord de deler.
+    Talere uden modpart får et nyt, ubrugt label.
+    """
+    starts = [item["start_time"] for item in previous]
+    pairs = Counter()
+    for item in overlap:
+        if item["type"] != "word":
+            continue
+        content = item["alternatives"][0]["content"].lower()
+        i = bisect.bisect_left(starts, item["start_time"] - SPEAKER_MATCH_SEC)
+        while i < len(previous) and previous[i]["start_time"] <= item["start_time"] + SPEAKER_MATCH_SEC:
+            other = previous[i]
+            if other["type"] == "word" and other["alternatives"][0]["content"].lower() == content:
+                pairs[(_speaker(item), _speaker(other))] += 1
+                break
+            i += 1
+
+    mapping = {}
+    taken = set()
+    for (local, known), _ in pairs.most_common():
+        if local in mapping or known in taken or local is None or known is None:
+            continue
+        mapping[local] = known
+        taken.add(known)
+    return mapping
+
+
+def _new_speaker_label(used_labels: set) -> str:
+    numbers = [int(label[1:]) for label in used_labels if re.fullmatch(r"S\d+", label)]
+    return f"S{max(numbers, default=0) + 1}"
+
+
+def stitch_transcripts(chunks: List[AudioChunk], transcripts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Samler json-v2 transskriptioner af delene til én, som om hele filen var sendt i ét job:
+    tider forskydes med delens start, overlappet bruges kun fra den forrige del, og talerlabels
+    oversættes til den første dels labels.
+    """
+    results = []
+    used_labels = set()
+    for chunk, transcript in zip(chunks, transcripts):
+        items = []
+        for item in transcript.get("results", []):
+            item = dict(item)
+            item["alternatives"] = [dict(alternative) for alternative in item.get("alternatives", [])]
+            item["start_time"] = item.get("start_time", 0.0) + chunk.start
+            if "end_time" in item:
+                item["end_time"] += chunk.start
+            items.append(item)
+        keep_to = chunk.keep_to if chunk is not chunks[-1] else float("inf")
+        kept = [item for item in items if chunk.keep_from <= item["start_time"] < keep_to]
+
+        if chunk.index > 0:
+            previous = [item for item in results if item["start_time"] >= chunk.start]
+            overlap = [item for item in items if item["start_time"] < chunk.keep_from]
+            mapping = _match_speakers(previous, overlap)
+            for label in sorted({_speaker(item) for item in kept} - {None, "UU"} - set(mapping)):
+                mapping[label] = _new_speaker_label(used_labels | set(mapping.values()))
+            logger.debug(f"Talere i del {chunk.index + 1}: {mapping}")
+            for item in kept:
+                for alternative in item["alternatives"]:
+                    if alternative.get("speaker") in mapping:
+                        alternative["speaker"] = mapping[alternative["speaker"]]
+            # Tegnsætning i starten af delen hører til et ord fra den forrige del
+            while kept and kept[0]["type"] == "punctuation" and results and results[-1]["type"] == "punctuation":
+                kept.pop(0)
+
+        used_labels.update(_speaker(item) for item in kept if _speaker(item) not in (None, "UU"))
+        results.extend(kept)
+
+    stitched = dict(transcripts[0])
+    stitched["results"] = results
+    if isinstance(stitched.get("job"), dict):
+        stitched["job"] = dict(stitched["job"], duration=chunks[-1].end)
+    return stitched
+
+
+class JobFailed(Exception):
+    """Jobbet er afvist, slettet eller udløbet hos Speechmatics og kan ikke hentes"""
+
+
+class JobStore:
+    """
+    JSON-fil med indsendte jobs, så et betalt job kan hentes efter en genstart i stedet for at blive sendt igen.
+    Hvert job gemmes med den cachenøgle resultatet hører til, inputfil, mediehash og konfiguration.
+    En relativ sti lægges i brugerens datamappe.
+    Skrivninger serialiseres med en låsefil, så GUI'en og --resume kan bruge filen samtidig uden at miste jobs.
+    """
+    STALE_LOCK_SEC = 10.0  # En låsefil der er ældre end dette, er efterladt af en proces der gik ned
+
+    def __init__(self, path: str):
+        self.path = data_path(path)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """Holder trådlåsen og låsefilen <path>.lock under en læs-ændr-skriv af jobfilen"""
+        lock_path = f"{self.path}.lock"
+        with self._lock:
+            while True:
+                try:
+                    os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - os.path.getmtime(lock_path) > self.STALE_LOCK_SEC:
+                            logger.warning(f"Fjerner forældet låsefil {lock_path}")
+                            os.remove(lock_path)
+                            continue
+                    except OSError:
+                        continue  # Låsen blev frigivet imens
+                    time.sleep(0.01)
+            try:
+                yield
+            finally:
+                os.remove(lock_path)
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Kunne ikke læse jobfilen {self.path}: {e}")
+            return {}
+
+    def _save(self, jobs: Dict[str, dict]):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(jobs, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def add(self, job_id: str, result_key: str, input_file: str, media_hash: str, config_dict: dict,
+            chunk: Optional[AudioChunk] = None):
+        with self._locked():
+            jobs = self._load()
+            jobs[job_id] = {
+                "result_key": result_key,
+                "input_file": os.path.abspath(input_file),
+                "media_hash": media_hash,
+                "config": config_dict,
+                "chunk": {"index": chunk.index, "start": chunk.start, "end": chunk.end} if chunk else None,
+                "submitted_at": time.time()
+            }
+            self._save(jobs)
+
+    def find(self, result_key: str) -> Optional[str]:
+        """Det senest indsendte job for en cachenøgle"""
+        with self._lock:
+            matches = [(record["submitted_at"], job_id) for job_id, record in self._load().items()
+                       if record["result_key"] == result_key]
+        return max(matches)[1] if matches else None
+
+    def remove(self, job_id: str):
+        with self._locked():
+            jobs = self._load()
+            if jobs.pop(job_id, None) is not None:
+                self._save(jobs)
+
+    def pending(self) -> Dict[str, dict]:
+        with self._lock:
+            return self._load()
+
+
+class JobCancelled(Exception):
+    """Venten på jobbet blev afbrudt, fordi resultatet ikke længere skal bruges"""
+
+
+class JobPoller:
+    """
+    Følger mange Speechmatics-jobs på én gang med asyncio. SDK'ets kald er synkrone og køres i tråde,
+    så en langsom statusforespørgsel ikke holder de andre jobs tilbage.
+    """
+    def __init__(self, settings: ConnectionSettings, interval: float = POLL_INTERVAL_SEC, max_requests: int = 8):
+        self.settings = settings
+        self.interval = interval
+        self.max_requests = max_requests
+
+    async def _call(self, semaphore: asyncio.Semaphore, func: Callable, *args, **kwargs):
+        async with semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def wait(self, client, semaphore: asyncio.Semaphore, job_id: str,
+                   stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Venter på ét job og henter dets json-v2 transskription. Afbrydes med JobCancelled når stop sættes."""
+        while True:
+            if stop is not None and stop.is_set():
+                raise JobCancelled(f"Venten på job {job_id} afbrudt")
+            # SDK'et oversætter 404 til JobNotFoundException - jobbet er slettet eller udløbet
+            try:
+                status = (await self._call(semaphore, client.check_job_status, job_id))["job"]["status"]
+                if status == "done":
+                    return await self._call(semaphore, client.get_job_result, job_id, transcription_format="json-v2")
+            except JobNotFoundException as e:
+                raise JobFailed(f"Job {job_id} findes ikke længere") from e
+            if status in FAILED_JOB_STATUSES:
+                raise JobFailed(f"Job {job_id} har status {status}")
+            logger.debug(f"Job {job_id}: {status}")
+            await self._sleep(stop)
+
+    async def _sleep(self, stop: Optional[threading.Event]):
+        """Venter et pollinterval, men vågner hurtigt hvis stop sættes"""
+        if stop is None:
+            await asyncio.sleep(self.interval)
+            return
+        deadline = time.monotonic() + self.interval
+        while not stop.is_set() and (remaining := deadline - time.monotonic()) > 0:
+            await asyncio.sleep(min(remaining, 0.2))
+
+    async def wait_all(self, job_ids: List[str], stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Venter på alle jobs. Et job der fejler, giver sin undtagelse som resultat i stedet for en transskription."""
+        semaphore = asyncio.Semaphore(self.max_requests)
+        with BatchClient(self.settings) as client:
+            results = await asyncio.gather(*(self.wait(client, semaphore, job_id, stop) for job_id in job_ids),
+                                           return_exceptions=True)
+        return dict(zip(job_ids, results))
+
+    def run(self, job_ids: List[str], stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+        return asyncio.run(self.wait_all(job_ids, stop))
+
+    def wait_for(self, job_id: str, stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Synkron venten på ét job, til brug fra tråde uden egen event loop"""
+        result = self.run([job_id], stop)[job_id]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
 class AudioConverter:
-    """Håndterer konvertering af video/lyd til WAV format"""
+    """Håndterer konvertering af video/lyd til de lydformater der sendes til Speechmatics"""
     @staticmethod
     def find_ffmpeg() -> Optional[str]:
         logger.debug("Søger efter ffmpeg...")
@@ -108,13 +517,78 @@ class AudioConverter:
             logger.error("ffmpeg ikke fundet")
             return None
 
+    @staticmethod
+    def detect_silences(input_path: str) -> Optional[Tuple[float, List[Tuple[float, float]]]]:
+        """Finder optagelsens længde og pauser med ffmpegs silencedetect. Returnerer None ved fejl."""
+        ffmpeg_path = AudioConverter.find_ffmpeg()
+        if not ffmpeg_path:
+            return None
+        command = [
+            ffmpeg_path, '-nostdin', '-i', input_path, '-vn',
+            '-af', f'silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SEC}',
+            '-f', 'null', '-'
+        ]
+        logger.debug(f"ffmpeg kommando: {' '.join(command)}")
+        process = subprocess.run(command, capture_output=True, text=True, errors="replace")
+        if process.returncode != 0:
+            logger.error(f"silencedetect fejlede: {process.stderr[-2000:]}")
+            return None
+
+        match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", process.stderr)
+        if not match:
+            logger.error("Kunne ikke aflæse optagelsens længde")
+            return None
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+        starts = [float(value) for value in re.findall(r"silence_start: (-?[\d.]+)", process.stderr)]
+        ends = [float(value) for value in re.findall(r"silence_end: ([\d.]+)", process.stderr)]
+        silences = list(zip(starts, ends))
+        logger.info(f"{input_path}: {duration:.0f} s, {len(silences)} pauser")
+        return duration, silences
+
+    @staticmethod
+    def open_stream(input_path: str, profile: str = STREAM_FALLBACK_PROFILE,
+                    start_sec: Optional[float] = None, end_sec: Optional[float] = None) -> Optional["FfmpegStream"]:
+        """
+        Starter ffmpeg med output til stdout, evt. kun for udsnittet [start_sec, end_sec).
+        Returnerer None hvis profilen ikke kan streames eller ffmpeg mangler.
+        """
+        audio_profile = AUDIO_PROFILES[profile]
+        if not audio_profile.streamable:
+            return None
+        ffmpeg_path = AudioConverter.find_ffmpeg()
+        if not ffmpeg_path:
+            return None
+        seek = ['-ss', f'{start_sec:.3f}'] if start_sec else []  # Før -i, så ffmpeg søger i stedet for at afkode
+        limit = ['-t', f'{end_sec - (start_sec or 0.0):.3f}'] if end_sec is not None else []
+        command = [
+            ffmpeg_path, '-nostdin', *seek, '-i', input_path,
+            *limit,
+            '-vn',
+            *audio_profile.codec_args,
+            '-f', audio_profile.container,
+            'pipe:1'
+        ]
+        logger.debug(f"ffmpeg kommando: {' '.join(command)}")
+        filename = os.path.splitext(os.path.basename(input_path))[0] + audio_profile.suffix
+        return FfmpegStream(command, filename)
+
     @staticmethod
     def convert_to_wav(input_path: str, progress_callback: Optional[Callable] = None) -> Optional[str]:
-        output_path = os.path.splitext(input_path)[0] + ".wav"
-        logger.info(f"Konverterer {input_path} til {output_path}")
+        return AudioConverter.convert_audio(input_path, "wav44k", progress_callback)
+
+    @staticmethod
+    def convert_audio(input_path: str, profile: str = DEFAULT_AUDIO_PROFILE,
+                      progress_callback: Optional[Callable] = None,
+                      output_path: Optional[str] = None) -> Optional[str]:
+        audio_profile = AUDIO_PROFILES[profile]
+        if output_path is None:
+            output_path = os.path.splitext(input_path)[0] + audio_profile.suffix
+        logger.info(f"Konverterer {input_path} til {output_path} (profil {profile})")
 
         if os.path.exists(output_path):
-            msg = f"Bruger eksisterende WAV fil: {output_path}"
+            msg = f"Bruger eksisterende lydfil: {output_path}"
             logger.info(msg)
             if progress_callback:
                 progress_callback(msg)
@@ -132,16 +606,14 @@ class AudioConverter:
             command = [
                 ffmpeg_path, '-i', input_path,
                 '-vn',
-                '-acodec', 'pcm_s16le',
-                '-ar', '44100',
-                '-ac', '2',
+                *audio_profile.codec_args,
                 '-y',
                 output_path
             ]
             logger.debug(f"ffmpeg kommando: {' '.join(command)}")
             
             if progress_callback:
-                progress_callback(f"Konverterer {input_path} til WAV...")
+                progress_callback(f"Konverterer {input_path} til {profile}...")
             
             result = subprocess.run(command, capture_output=True, text=True)
             
@@ -164,6 +636,59 @@ class AudioConverter:
                 progress_callback(msg)
             return None
 
+class StreamRewindError(RuntimeError):
+    """En delvist læst ffmpeg-pipe kan ikke sendes forfra"""
+
+
+class FfmpegStream:
+    """
+    Skrivebeskyttet læser over ffmpegs stdout. Den har bevidst hverken fileno eller tell,
+    så httpx ikke kan aflæse en (forkert) længde af pipen og i stedet uploader med chunked encoding.
+    """
+    def __init__(self, command: list, filename: str):
+        self.filename = filename
+        self.bytes_read = 0
+        self._stderr = bytearray()
+        self._process = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # stderr tømmes i baggrunden, så ffmpeg ikke blokerer når pipen er fuld
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    def _drain_stderr(self):
+        for line in self._process.stderr:
+            self._stderr.extend(line)
+            del self._stderr[:-4096]  # Behold kun slutningen til fejlbeskeder
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._process.stdout.read(size if size and size > 0 else 1 << 16)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """
+        httpx spoler filen tilbage hver gang multipart-kroppen bygges. Før første læsning er det en no-op.
+        Er der allerede læst data, er det SDK'ets genforsøg efter en afbrudt upload - resten af pipen
+        ville så blive sendt som en hel (afkortet) fil, så genforsøget afbrydes i stedet.
+        """
+        if offset == 0 and whence == os.SEEK_SET and self.bytes_read == 0:
+            return 0
+        raise StreamRewindError(f"{self.filename}: {self.bytes_read} bytes er allerede sendt og kan ikke sendes igen")
+
+    def close(self) -> bool:
+        """Stopper ffmpeg og returnerer om konverteringen gik godt"""
+        self._process.stdout.close()
+        returncode = self._process.wait()
+        self._stderr_thread.join(timeout=1)
+        if returncode != 0:
+            logger.error(f"ffmpeg fejlede under streaming ({returncode}): {self.stderr}")
+        return returncode == 0
+
+    @property
+    def stderr(self) -> str:
+        return self._stderr.decode("utf-8", errors="replace")
+
+
 class SpeechRecognizer:
     """Hovedklasse for talegenkendelse"""
     def __init__(self, config: RecognitionConfig):
@@ -173,11 +698,236 @@ class SpeechRecognizer:
                 url="https://asr.api.speechmatics.com/v2",
                 auth_token=config.api_key
             )
+            self.poller = JobPoller(self.settings)
+            self.jobs = JobStore(config.job_store_path) if config.job_store_path else None
+            self.cache = None
+            if config.transcript_cache_dir:
+                try:
+                    self.cache = TranscriptCache(config.transcript_cache_dir, int(config.transcript_cache_max_mb * 1e6))
+                except OSError as e:
+                    logger.warning(f"Transskriptionscachen kan ikke bruges: {e}")
             logger.info("SpeechRecognizer initialiseret")
         except Exception as e:
             logger.error(f"Fejl ved initialisering af SpeechRecognizer: {str(e)}")
             raise
     
+    def _prepare_audio(self, input_file: str, progress_callback: Optional[Callable] = None) -> str:
+        """Konverterer til den valgte lydprofil og falder tilbage til originalfilen hvis det fejler"""
+        audio_file = None
+        profile = AUDIO_PROFILES[self.config.audio_profile]
+        if input_file.lower().endswith(profile.suffix.lower()):
+            audio_file = input_file  # Allerede i det rigtige format
+        else:
+            audio_file = AudioConverter.convert_audio(input_file, self.config.audio_profile, progress_callback)
+        
+        # Hvis konvertering fejler, brug originalfilen som fallback
+        if not audio_file:
+            msg = f"Kunne ikke konvertere {input_file} til {self.config.audio_profile}. Sender originalfil som fallback."
+            logger.warning(msg)
+            if progress_callback:
+                progress_callback(msg)
+            audio_file = input_file  # Fallback til den originale fil
+        logger.info(f"Uploader {audio_file} ({os.path.getsize(audio_file) / 1e6:.1f} MB)")
+        return audio_file
+
+    def _submit_streamed(self, client, input_file: str, config_dict: dict,
+                         progress_callback: Optional[Callable] = None) -> Optional[str]:
+        """
+        Uploader ffmpegs output mens det produceres, så der ikke skrives en lydfil ved siden af kilden.
+        Returnerer job-ID eller None, hvis der skal falde tilbage til upload af en konverteret fil.
+        """
+        profile = self._stream_profile()
+        if input_file.lower().endswith(AUDIO_PROFILES[profile].suffix.lower()):
+            return None  # Filen er allerede i det rigtige format og kan sendes direkte
+
+        stream = AudioConverter.open_stream(input_file, profile)
+        if stream is None:
+            return None
+
+        if progress_callback:
+            progress_callback(f"Konverterer og uploader {input_file} som {profile}...")
+        job_id = None
+        try:
+            job_id = client.submit_job(
+                audio=(stream.filename, stream),
+                transcription_config=config_dict
+            )
+        except HTTPStatusError as e:
+            if e.response.status_code == 401:
+                raise  # En ny upload af en fil hjælper ikke på en ugyldig nøgle
+            logger.warning(f"Streaming-upload afvist ({e.response.status_code}), uploader konverteret fil i stedet")
+        except Exception as e:
+            logger.warning(f"Streaming-upload fejlede ({e}), uploader konverteret fil i stedet")
+        finally:
+            succeeded = stream.close()
+
+        if job_id is not None and not succeeded:
+            # Jobbet har fået ufuldstændig lyd, så det slettes og filen uploades i stedet
+            logger.warning(f"ffmpeg fejlede efter upload, sletter job {job_id}")
+            try:
+                client.delete_job(job_id, force=True)
+            except Exception as e:
+                logger.warning(f"Kunne ikke slette job {job_id}: {e}")
+            return None
+        if job_id is not None:
+            logger.info(f"Streamede {stream.bytes_read / 1e6:.1f} MB til Speechmatics")
+        return job_id
+
+    def _cached(self, result_key: str) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(result_key)
+        except OSError as e:
+            logger.warning(f"Kunne ikke læse fra transskriptionscachen: {e}")
+            return None
+
+    def _register(self, job_id: str, result_key: str, input_file: str, media_hash: str, config_dict: dict,
+                  chunk: Optional[AudioChunk] = None):
+        if self.jobs is None:
+            return
+        try:
+            self.jobs.add(job_id, result_key, input_file, media_hash, config_dict, chunk)
+        except OSError as e:
+            logger.warning(f"Kunne ikke gemme job {job_id} i jobfilen: {e}")
+
+    def _finish(self, result_key: str, job_id: Optional[str], transcript: Dict[str, Any]):
+        """Gemmer et hentet resultat i cachen og fjerner jobbet fra jobfilen"""
+        if self.cache is not None:
+            try:
+                self.cache.put(result_key, transcript)
+            except OSError as e:
+                logger.warning(f"Kunne ikke gemme transskriptionen i cachen: {e}")
+        if self.jobs is not None:
+            try:
+                self.jobs.remove(job_id)
+            except OSError as e:
+                logger.warning(f"Kunne ikke fjerne job {job_id} fra jobfilen: {e}")
+
+    def _resume(self, result_key: str, progress_callback: Optional[Callable] = None,
+                stop: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        """Henter resultatet af et tidligere indsendt job for samme nøgle, hvis der er et"""
+        if self.jobs is None:
+            return None
+        # Der kan ligge flere forældede jobs for samme nøgle - de fjernes et ad gangen
+        while (job_id := self.jobs.find(result_key)) is not None:
+            msg = f"Genoptager job {job_id}"
+            logger.info(msg)
+            if progress_callback:
+                progress_callback(msg)
+            try:
+                transcript = self.poller.wait_for(job_id, stop)
+            except JobFailed as e:
+                logger.warning(f"{e} - fjernes fra jobfilen")
+                self.jobs.remove(job_id)
+                continue
+            self._finish(result_key, job_id, transcript)
+            return transcript
+        return None
+
+    def _stream_profile(self) -> str:
+        """Den valgte lydprofil, eller STREAM_FALLBACK_PROFILE hvis den ikke kan streames"""
+        profile = self.config.audio_profile
+        return profile if AUDIO_PROFILES[profile].streamable else STREAM_FALLBACK_PROFILE
+
+    def _transcribe_chunk(self, input_file: str, chunk: AudioChunk, config_dict: dict,
+                          media_hash: str, cache_key: str, stop: threading.Event) -> Dict[str, Any]:
+        """
+        Streamer én del til et selvstændigt job og venter på dens transskription.
+        Sættes stop, opgives delen, og et job der allerede er sendt, slettes hos Speechmatics.
+        """
+        chunk_key = TranscriptCache.make_chunk_key(cache_key, chunk)
+        transcript = self._cached(chunk_key)
+        if transcript is None:
+            transcript = self._resume(chunk_key, stop=stop)
+        if transcript is not None:
+            return transcript
+        if stop.is_set():
+            raise JobCancelled(f"Del {chunk.index + 1} sendes ikke")
+
+        stream = AudioConverter.open_stream(input_file, self._stream_profile(), chunk.start, chunk.end)
+        if stream is None:
+            raise RuntimeError("ffmpeg kunne ikke startes")
+        with BatchClient(self.settings) as client:
+            try:
+                job_id = client.submit_job(audio=(stream.filename, stream), transcription_config=config_dict)
+            finally:
+                succeeded = stream.close()
+            if not succeeded:
+                client.delete_job(job_id, force=True)
+                raise RuntimeError(f"ffmpeg fejlede for del {chunk.index + 1}")
+            logger.info(f"Del {chunk.index + 1} ({chunk.start:.0f}-{chunk.end:.0f} s) sendt som job {job_id}")
+        self._register(job_id, chunk_key, input_file, media_hash, config_dict, chunk)
+        try:
+            transcript = self.poller.wait_for(job_id, stop)
+        except JobCancelled:
+            self._cancel_job(job_id)
+            raise
+        self._finish(chunk_key, job_id, transcript)
+        return transcript
+
+    def _cancel_job(self, job_id: str):
+        """Sletter et job der ikke længere skal bruges, så det ikke kører videre (bedste forsøg)"""
+        try:
+            with BatchClient(self.settings) as client:
+                client.delete_job(job_id, force=True)
+            logger.info(f"Job {job_id} slettet")
+        except Exception as e:
+            logger.warning(f"Kunne ikke slette job {job_id}: {e}")
+        if self.jobs is not None:
+            self.jobs.remove(job_id)
+
+    def _run_chunked(self, input_file: str, config_dict: dict, media_hash: str, cache_key: str,
+                     progress_callback: Optional[Callable] = None) -> Optional[Dict[str, Any]]:
+        """
+        Transskriberer en lang optagelse som parallelle jobs opdelt ved pauser.
+        Returnerer None hvis optagelsen er for kort til opdeling, eller hvis en del fejler.
+        """
+        chunk_sec = self.config.chunk_minutes * 60
+        detected = AudioConverter.detect_silences(input_file)
+        if detected is None:
+            return None
+        duration, silences = detected
+        chunks = plan_chunks(duration, silences, chunk_sec, self.config.chunk_overlap_sec)
+        if len(chunks) < 2:
+            return None
+
+        msg = f"Deler optagelsen i {len(chunks)} dele og sender dem som parallelle jobs..."
+        logger.info(msg)
+        if progress_callback:
+            progress_callback(msg)
+
+        start = time.perf_counter()
+        transcripts = [None] * len(chunks)
+        stop = threading.Event()
+
+        def transcribe(chunk: AudioChunk) -> Dict[str, Any]:
+            try:
+                return self._transcribe_chunk(input_file, chunk, config_dict, media_hash, cache_key, stop)
+            except Exception:
+                # Sættes før tråden tager den næste del i køen, så den ikke når at blive sendt
+                stop.set()
+                raise
+
+        executor = ThreadPoolExecutor(max_workers=min(self.config.max_parallel_jobs, len(chunks)))
+        try:
+            futures = {executor.submit(transcribe, chunk): chunk for chunk in chunks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                chunk = futures[future]
+                transcripts[chunk.index] = future.result()
+                if progress_callback:
+                    progress_callback(f"Del {chunk.index + 1} transskriberet ({done}/{len(chunks)})")
+        except Exception as e:
+            logger.warning(f"Opdelt transskription fejlede ({e}), sender hele filen i ét job")
+            # De andre dele stoppes og deres jobs slettes i baggrunden - der ventes ikke på dem
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            return None
+        executor.shutdown()
+
+        logger.info(f"{len(chunks)} dele transskriberet på {time.perf_counter() - start:.0f} s")
+        return stitch_transcripts(chunks, transcripts)
+
     def run_recognition(self, input_file: str, progress_callback: Optional[Callable] = None) -> Optional[Dict[str, Any]]:
         """Udfører talegenkendelse med fallback til videofil."""
         try:
@@ -189,48 +939,63 @@ class SpeechRecognizer:
                     progress_callback(msg)
                 return None
 
-            # Forsøg at konvertere til WAV
-            wav_file = None
-            if not input_file.lower().endswith('.wav'):
-                wav_file = AudioConverter.convert_to_wav(input_file, progress_callback)
-            
-            # Hvis konvertering fejler, brug originalfilen som fallback
-            if not wav_file:
-                msg = f"Kunne ikke konvertere {input_file} til WAV. Sender originalfil som fallback."
-                logger.warning(msg)
+            config_dict = self.config.to_dict()
+            media_hash = media_fingerprint(input_file)
+            cache_key = TranscriptCache.make_key(media_hash, config_dict)
+            transcript = self._cached(cache_key)
+            if transcript is not None:
+                msg = "Transskription fundet i cachen"
+                logger.info(f"{msg} ({cache_key})")
                 if progress_callback:
                     progress_callback(msg)
-                wav_file = input_file  # Fallback til den originale fil
+                return transcript
+
+            # Et job fra en tidligere kørsel der blev afbrudt, hentes i stedet for at blive sendt igen
+            transcript = self._resume(cache_key, progress_callback)
+            if transcript is not None:
+                if progress_callback:
+                    progress_callback("Transskription modtaget")
+                return transcript
+
+            if self.config.chunk_minutes:
+                transcript = self._run_chunked(input_file, config_dict, media_hash, cache_key, progress_callback)
+                if transcript is not None:
+                    if progress_callback:
+                        progress_callback("Transskription modtaget")
+                    self._finish(cache_key, None, transcript)
+                    return transcript
 
             if progress_callback:
                 progress_callback("Opretter forbindelse til Speechmatics...")
             
             logger.debug("Opretter BatchClient")
             with BatchClient(self.settings) as client:
-                # Konfigurer job
-                config_dict = self.config.to_dict()
                 logger.debug(f"Job konfiguration: {config_dict}")
                 
                 try:
-                    job_id = client.submit_job(
-                        audio=wav_file,
-                        transcription_config=config_dict
-                    )
+                    job_id = None
+                    if self.config.stream_upload:
+                        job_id = self._submit_streamed(client, input_file, config_dict, progress_callback)
+                    if job_id is None:
+                        audio_file = self._prepare_audio(input_file, progress_callback)
+                        job_id = client.submit_job(
+                            audio=audio_file,
+                            transcription_config=config_dict
+                        )
                     logger.info(f"Job oprettet med ID: {job_id}")
+                    self._register(job_id, cache_key, input_file, media_hash, config_dict)
                     if progress_callback:
                         progress_callback(f"Job oprettet med ID: {job_id}")
 
                     # Vent på resultater
                     logger.info("Venter på resultater...")
-                    transcript = client.wait_for_completion(
-                        job_id,
-                        transcription_format='json-v2'
-                    )
+                    transcript = self.poller.wait_for(job_id)
                     
                     if progress_callback:
                         progress_callback("Transskription modtaget")
                     
                     logger.info("Transskription modtaget succesfuldt")
+                    self._finish(cache_key, job_id, transcript)
                     return transcript
 
                 except HTTPStatusError as e:
@@ -284,6 +1049,49 @@ def recognize_speech(input_file: str, config: Dict, progress_callback: Optional[
             progress_callback(msg)
         return None
 
+def resume_pending_jobs(config: Dict, progress_callback: Optional[Callable] = None) -> int:
+    """
+    Følger alle jobs i jobfilen samtidig og henter de færdige ind i transskriptionscachen,
+    så næste kørsel af samme fil ikke sender noget. Hele filer gemmes også som <input>_transcript.json.
+
+    Returns:
+        int: Antal hentede transskriptioner
+    """
+    recognizer = SpeechRecognizer(RecognitionConfig(**config))
+    if recognizer.jobs is None:
+        return 0
+    pending = recognizer.jobs.pending()
+    if not pending:
+        if progress_callback:
+            progress_callback("Ingen ventende jobs")
+        return 0
+
+    if progress_callback:
+        progress_callback(f"Følger {len(pending)} ventende jobs...")
+    fetched = 0
+    for job_id, result in recognizer.poller.run(list(pending)).items():
+        record = pending[job_id]
+        if isinstance(result, JobFailed):
+            logger.warning(f"{result} - fjernes fra jobfilen")
+            recognizer.jobs.remove(job_id)
+            continue
+        if isinstance(result, BaseException):
+            logger.error(f"Kunne ikke hente job {job_id}: {result}")  # Bliver i jobfilen til næste forsøg
+            continue
+
+        recognizer._finish(record["result_key"], job_id, result)
+        fetched += 1
+        msg = f"Job {job_id} hentet ({record['input_file']})"
+        if record.get("chunk") is None:
+            output_file = os.path.splitext(record["input_file"])[0] + "_transcript.json"
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            msg += f" og gemt i {output_file}"
+        logger.info(msg)
+        if progress_callback:
+            progress_callback(msg)
+    return fetched
+
 if __name__ == "__main__":
     import sys
     from dotenv import load_dotenv
@@ -292,6 +1100,7 @@ if __name__ == "__main__":
         print(msg)
         logger.info(f"Progress: {msg}")
 
+    setup_logging()
     logger.info("=== DrGenkend startet fra kommandolinje ===")
 
     # Indlæs miljøvariabler
@@ -305,9 +1114,13 @@ if __name__ == "__main__":
 
     if len(sys.argv) != 2:
         logger.error("Forkert antal argumenter")
-        print("Brug: python DrGenkend.py <input_file>")
+        print("Brug: python DrGenkend.py <input_file> | --resume")
         sys.exit(1)
 
+    if sys.argv[1] == "--resume":
+        resume_pending_jobs({"api_key": api_key}, print_progress)
+        sys.exit(0)
+
     # Konfiguration
     config = {
         "api_key": api_key,
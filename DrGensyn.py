@@ -1,5 +1,4 @@
 import sys
-from dotenv import load_dotenv
 import os
 import configparser
 from PyQt5 import QtWidgets, QtCore
@@ -14,8 +13,12 @@ from typing import List, Tuple, Optional
 import json
 import pysrt
 from DrGenkend import recognize_speech
-from DrSegment import segment_json
-from DrKondens import condense_texts
+from DrSegment import segment_json_stream, write_srt
+from DrKondens import condense_texts, load_environment
+from DrLog import get_logger, setup_logging
+
+# Niveauet kan sættes pr. modul, fx DRGENSYN_LOG_LEVEL=DEBUG for at se linjedelingen
+logger = get_logger('DrGensyn')
 
 class Colors:
     """Farvetema for applikationen"""
@@ -61,10 +64,10 @@ class TextFormatter:
                     
                     # Tjek om begge linjer overholder max_chars
                     if len(line1) <= self.max_chars and len(line2) <= self.max_chars:
-                        print(f"Fandt deling ved '{punct}': \nLinje 1: {line1}\nLinje 2: {line2}")
+                        logger.debug("Fandt deling ved '%s': Linje 1: %s | Linje 2: %s", punct, line1, line2)
                         return line1, line2
                     else:
-                        print(f"Deling ved '{punct}' gav for lange linjer ({len(line1)}, {len(line2)})")
+                        logger.debug("Deling ved '%s' gav for lange linjer (%d, %d)", punct, len(line1), len(line2))
         
         return None
 
@@ -78,7 +81,7 @@ class TextFormatter:
                 line2 = text[pos + 1:].strip()  # +1 for at fjerne mellemrum
                 
                 if len(line1) <= self.max_chars and len(line2) <= self.max_chars:
-                    print(f"Fandt deling ved '{word}': \nLinje 1: {line1}\nLinje 2: {line2}")
+                    logger.debug("Fandt deling ved '%s': Linje 1: %s | Linje 2: %s", word, line1, line2)
                     return line1, line2
         return None
 
@@ -87,25 +90,25 @@ class TextFormatter:
         Formaterer tekst efter reglerne. Returnerer (formateret_tekst, needs_condensing)
         """
         text = text.strip()
-        print(f"\nFormaterer tekst ({len(text)} tegn): {text}")
+        logger.debug("Formaterer tekst (%d tegn): %s", len(text), text)
 
         # Regel 1: Hvis teksten kan være på én linje
         if len(text) <= self.max_chars:
-            print("Tekst er kort nok til én linje")
+            logger.debug("Tekst er kort nok til én linje")
             return text, False
 
         # Regel 2: Prøv at dele ved tegnsætning
         result = self.try_punctuation_split(text)
         if result:
             line1, line2 = result
-            print("Bruger deling ved tegnsætning")
+            logger.debug("Bruger deling ved tegnsætning")
             return f"{line1}\n{line2}", False
 
         # Regel 3: Prøv at dele ved småord
         result = self.try_word_split(text)
         if result:
             line1, line2 = result
-            print("Bruger deling ved småord")
+            logger.debug("Bruger deling ved småord")
             return f"{line1}\n{line2}", False
             
         # Regel 4: Prøv at dele ved sidste ord der passer
@@ -128,15 +131,15 @@ class TextFormatter:
             line2_text = ' '.join(words[len(line1):])
             
             if len(line1_text) <= self.max_chars and len(line2_text) <= self.max_chars:
-                print(f"Bruger ordbaseret deling:\nLinje 1: {line1_text}\nLinje 2: {line2_text}")
+                logger.debug("Bruger ordbaseret deling: Linje 1: %s | Linje 2: %s", line1_text, line2_text)
                 return f"{line1_text}\n{line2_text}", False
 
         # Regel 5: Hvis ingen delinger virkede OG teksten er over 2 × max_chars
         if len(text) > 2 * self.max_chars:
-            print(f"Tekst for lang til todeling ({len(text)} > {2 * self.max_chars})")
+            logger.debug("Tekst for lang til todeling (%d > %d)", len(text), 2 * self.max_chars)
             return text, True
 
-        print(f"Kunne ikke finde god deling. Længde: {len(text)}")
+        logger.debug("Kunne ikke finde god deling. Længde: %d", len(text))
         return text, True
 
 def adjust_subtitle_gaps(subs, fps=25):
@@ -178,7 +181,7 @@ class ProcessingThread(QThread):
 
         # Indlæs API-nøglen fra .env hvis genkend er aktiveret
         if self.modules.get("genkend"):
-            load_dotenv()
+            load_environment()
             api_key = os.getenv("SPEECHMATICS_API_KEY")
             if not api_key:
                 raise ValueError("FEJL: Ingen API-nøgle fundet i .env-filen. Tilføj 'SPEECHMATICS_API_KEY=<din_nøgle>'.")
@@ -236,26 +239,21 @@ class ProcessingThread(QThread):
                 def segment_callback(msg):
                     self.status_update.emit(msg)
 
-                # Load JSON fra tidligere step eller input fil
-                with open(input_for_next, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
-                
                 # Tilføj merge_threshold_sec til config hvis ikke allerede sat
                 segment_config = {"merge_threshold_sec": self.config.get("merge_threshold_sec", 7.0)}
                 
+                # Læs JSON fra tidligere step eller input fil som en strøm
                 srt_path = f"{base_path}.srt"
-                srt_items = segment_json(
-                    json_data=json_data,
+                # Underteksterne skrives direkte efterhånden som de segmenteres
+                written = write_srt(segment_json_stream(
+                    json_path=input_for_next,
                     config=segment_config,
                     progress_callback=segment_callback
-                )
+                ), srt_path)
 
-                if not srt_items:
+                if not written:
                     raise Exception("Fejl i segmentering")
                 
-                subs = pysrt.SubRipFile(srt_items)
-                subs.save(srt_path, encoding='utf-8')
-                
                 current_progress = 66
                 self.progress_update.emit(current_progress)
                 input_for_next = srt_path
@@ -271,6 +269,7 @@ class ProcessingThread(QThread):
 
                 formatter = TextFormatter(max_chars)
                 stats = {"formatted": 0, "condensed": 0, "unchanged": 0, "errors": 0}
+                gpt_stats = {}
 
                 total_subs = len(subs)
                 self.status_update.emit(f"Behandler {total_subs} undertekster...")
@@ -306,7 +305,8 @@ class ProcessingThread(QThread):
                         texts=texts_to_condense,
                         chars_per_line=max_chars,    # ✅ Brug chars_per_line i stedet
                         lines_per_subtitle=2,        # ✅ Tilføj lines_per_subtitle 
-                        progress_callback=lambda msg, i, total: self.status_update.emit(f"{msg} ({i+1}/{total})")
+                        progress_callback=lambda msg, i, total: self.status_update.emit(msg),  # Beskeden har allerede antallet
+                        stats=gpt_stats
                     )
                         
                     # Opdater undertekster med kondenserede versioner
@@ -332,6 +332,10 @@ class ProcessingThread(QThread):
                 output_path = f"{base_path}_kondenseret.srt"
                 subs.save(output_path, encoding='utf-8')
 
+                # Gem statistik for filen ved siden af SRT'en, så forbrug og svartider kan sammenlignes
+                with open(f"{base_path}_kondenseret.stats.json", 'w', encoding='utf-8') as f:
+                    json.dump({**stats, "gpt": gpt_stats}, f, ensure_ascii=False, indent=2)
+
                 # Vis statistik
                 self.status_update.emit(
                     f"Behandling færdig:\n"
@@ -340,6 +344,14 @@ class ProcessingThread(QThread):
                     f"{stats['condensed']} tekster blev forkortet\n"
                     f"{stats['errors']} tekster fejlede i kondensering"
                 )
+                if gpt_stats:
+                    self.status_update.emit(
+                        f"GPT: {sum(gpt_stats['gpt_calls'].values())} kald, "
+                        f"{gpt_stats['total_tokens']} tokens "
+                        f"({gpt_stats['prompt_tokens']} prompt / {gpt_stats['completion_tokens']} svar), "
+                        f"{gpt_stats['gpt_seconds']:.1f} sek i alt, p50 {gpt_stats['latency_p50']:.2f} sek, "
+                        f"{gpt_stats['cache_hits']} fra cache, {gpt_stats['local_hits']} lokalt"
+                    )
 
             current_progress = 100
             self.progress_update.emit(current_progress)
@@ -1036,6 +1048,9 @@ def load_settings_to_gui(window):
     window.max_chars_spin.setValue(config.getint("KONDENS", "max_chars", fallback=37))
 
 if __name__ == "__main__":
+    setup_logging()
+    # .env indlæses én gang ved opstart og deles af alle filer i køen
+    load_environment()
     app = QApplication(sys.argv)
     window = DrOrkestrator()
     window.show()
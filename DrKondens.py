@@ -1,8 +1,33 @@
 import os
-from typing import Optional, Callable, List, Tuple
+import re
+import json
+import time
+import heapq
+import random
+import sqlite3
+import hashlib
+import itertools
+import threading
+import importlib.util
+import httpx
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
+from typing import Optional, Callable, List, Tuple, Dict, NamedTuple
 from dataclasses import dataclass
-from openai import AzureOpenAI
+from openai import AzureOpenAI, RateLimitError, APIConnectionError, APIStatusError
 from dotenv import load_dotenv
+from DrPaths import data_path
+from DrLog import get_logger
+
+# Niveauet kan sættes pr. modul, fx DRKONDENS_LOG_LEVEL=DEBUG for at se prompts og svar
+logger = get_logger('DrKondens')
+
+# Tælles op når prompts eller validering ændres, så gamle svar i cachen ikke genbruges
+PROMPT_VERSION = 1
+
+# Førstegangsforsøg går forud for fallback-kald, når kvoten er opbrugt
+PRIORITY_FIRST = 0
+PRIORITY_FALLBACK = 1
 
 @dataclass
 class CondensationConfig:
@@ -12,29 +37,539 @@ class CondensationConfig:
     model_name: str = "gptx4xo_relaxed"
     temperatures: List[float] = None
     max_chars: int = None  # Beregnes automatisk i __post_init__
+    parallel_temperatures: bool = True  # Send alle temperaturer til GPT samtidig
+    early_accept_ratio: Optional[float] = None  # Fx 0.9: stop ved første gyldige forslag på mindst 90% af max_chars
+    candidates_per_request: int = 1  # Over 1: hent flere kandidater pr. kald (n) i stedet for ét kald pr. temperatur
+    candidate_temperatures: List[float] = None  # Temperaturer når candidates_per_request > 1
+    max_concurrency: int = 8  # Antal undertekster der kondenseres samtidig i condense_text_batch (1 = sekventielt)
+    cache_path: Optional[str] = "drkondens_cache.sqlite"  # Relativ til datamappen (DrPaths); None slår cachen fra
+    cache_max_entries: int = 50000  # Ældst brugte svar fjernes over denne grænse
+    prompt_batch_size: int = 1  # Antal undertekster pr. GPT-kald i condense_text_batch (1 = ét kald pr. tekst)
+    requests_per_minute: int = 300  # Kvote for deploymentet (RPM)
+    tokens_per_minute: int = 50000  # Kvote for deploymentet (TPM)
+    max_retries: int = 6  # Genforsøg ved 429, timeouts og serverfejl
+    max_connections: int = 32  # Forbindelser i den fælles HTTP-pulje
+    max_keepalive_connections: int = 32  # Forbindelser der holdes åbne mellem kald og filer
+    local_condensation: bool = True  # Prøv regelbaseret kondensering før GPT
+    filler_words: List[str] = None  # Fyldord der må fjernes lokalt som indskud (None = LocalCondenser.FILLER_WORDS)
+    contractions: Dict[str, str] = None  # Sammentrækninger der må bruges lokalt (None = LocalCondenser.CONTRACTIONS)
+    validation_rules: Dict[str, List[str]] = None  # Forbudte tekststykker pr. regel (None = TextValidator.DEFAULT_RULES)
 
     def __post_init__(self):
         if self.temperatures is None:
             self.temperatures = [0.3, 0.7, 1.0]
+        if self.candidate_temperatures is None:
+            self.candidate_temperatures = [0.4, 0.9]
         if self.max_chars is None:
             self.max_chars = self.chars_per_line * self.lines_per_subtitle
 
+class TokenBucket:
+    """Token bucket der fyldes jævnt op til capacity pr. minut. Kaldes under schedulerens lås."""
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Sekunder til der er plads til amount (0 hvis der er plads nu)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RequestScheduler:
+    """
+    Fælles styring af kald til et Azure OpenAI deployment.
+    Begrænser både requests og tokens pr. minut, venter Retry-After ud ved 429 og prøver igen
+    med eksponentiel backoff og jitter. Ventende kald med lavest prioritet sendes først.
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._waiting = []  # Heap af (prioritet, løbenummer)
+        self._seq = itertools.count()
+        self._paused_until = 0.0  # Sættes af Retry-After, da kvoten deles af alle kald
+        self.retries = 0
+
+    def _acquire(self, tokens: int, priority: int):
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] != ticket:
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    wait = max(
+                        self._paused_until - now,
+                        self._requests.wait_time(1, now),
+                        self._tokens.wait_time(tokens, now)
+                    )
+                    if wait <= 0:
+                        self._requests.take(1)
+                        self._tokens.take(tokens)
+                        return
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def record_usage(self, estimated: int, actual: int):
+        """Retter token-bucketen til det faktiske forbrug, når svaret kendes"""
+        with self._cond:
+            if actual < estimated:
+                self._tokens.give_back(estimated - actual)
+            else:
+                self._tokens.take(actual - estimated)
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000.0
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            pass
+        return None
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (RateLimitError, APIConnectionError)):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code >= 500
+
+    def call(self, func: Callable[[], object], tokens: int, priority: int = PRIORITY_FIRST):
+        """Kalder func når kvoten tillader det og prøver igen ved 429, timeouts og serverfejl"""
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens, priority)
+            try:
+                return func()
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                retry_after = self._retry_after(e)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                    if isinstance(e, RateLimitError):
+                        with self._cond:
+                            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                with self._cond:
+                    self.retries += 1
+                logger.info("GPT-kald fejlede (%s), prøver igen om %.1f sek (forsøg %d/%d)",
+                            type(e).__name__, delay, attempt + 1, self.max_retries)
+                time.sleep(delay)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(config: CondensationConfig) -> RequestScheduler:
+    """Returnerer den fælles scheduler for deploymentet, så alle condensere deler samme kvote"""
+    key = (config.model_name, config.requests_per_minute, config.tokens_per_minute, config.max_retries)
+    with _schedulers_lock:
+        if key not in _schedulers:
+            _schedulers[key] = RequestScheduler(
+                config.requests_per_minute, config.tokens_per_minute, config.max_retries
+            )
+        return _schedulers[key]
+
+
+# HTTP/2 kræver pakken h2 (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_env_loaded = False
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def load_environment():
+    """Indlæser .env én gang pr. proces"""
+    global _env_loaded
+    with _clients_lock:
+        if not _env_loaded:
+            load_dotenv()
+            _env_loaded = True
+
+
+def get_client(config: CondensationConfig) -> AzureOpenAI:
+    """
+    Returnerer en fælles AzureOpenAI-klient for processen, så forbindelser og TLS-sessioner
+    genbruges på tværs af filer. Der laves en ny klient hvis endpoint, nøgle eller puljegrænser ændres.
+    """
+    load_environment()
+    endpoint = os.getenv("OPENAI_AZURE_ENDPOINT")
+    api_key = os.getenv("OPENAI_AZURE_API_KEY")
+    key = (endpoint, api_key, config.max_connections, config.max_keepalive_connections)
+    with _clients_lock:
+        if key not in _clients:
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections
+                ),
+                http2=HTTP2_AVAILABLE
+            )
+            _clients[key] = AzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version="2023-06-01-preview",
+                max_retries=0,  # Genforsøg styres af RequestScheduler
+                http_client=http_client
+            )
+            logger.debug("Oprettede AzureOpenAI-klient (http2=%s, forbindelser=%d)",
+                         HTTP2_AVAILABLE, config.max_connections)
+        return _clients[key]
+
+
+class CondensationStats:
+    """Samler tokens, svartider og udfald for alle GPT-kald under kondenseringen af én fil"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()  # Antal kald pr. type (condensation, batch, fallback)
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies: List[float] = []  # Sekunder pr. kald inkl. ventetid i scheduleren
+        self.outcomes: Dict[str, Counter] = {}  # Temperatur -> udfald (accepted, too_long eller regelnavn)
+
+    def record_call(self, kind: str, seconds: float, usage=None, error: bool = False):
+        with self._lock:
+            self.calls[kind] += 1
+            self.latencies.append(seconds)
+            if error:
+                self.errors += 1
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    def record_outcome(self, label, outcome: str):
+        label = f"{label:g}" if isinstance(label, float) else str(label)
+        with self._lock:
+            self.outcomes.setdefault(label, Counter())[outcome] += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            def pct(p: float) -> float:
+                if not latencies:
+                    return 0.0
+                return round(latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))], 3)
+            return {
+                "gpt_calls": dict(self.calls),
+                "gpt_errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+                "gpt_seconds": round(sum(latencies), 3),
+                "latency_p50": pct(50),
+                "latency_p95": pct(95),
+                "latency_max": round(latencies[-1], 3) if latencies else 0.0,
+                "outcomes": {label: dict(counter) for label, counter in self.outcomes.items()},
+            }
+
+
+class CondensationCache:
+    """
+    SQLite-cache med kondenserede tekster, så genkørsler af samme tekst ikke spørger GPT igen.
+    Nøglen dækker normaliseret tekst, fortsættelsesstreger, linjeformat, model, valideringsreglerne
+    og PROMPT_VERSION, så svar som ændrede regler ville afvise, ikke genbruges.
+    En relativ sti lægges i brugerens datamappe.
+    """
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = data_path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Forbindelsen deles mellem kondenseringstrådene og beskyttes af låsen
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS condensations ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON condensations (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, is_continuation: bool, continues: bool, config: CondensationConfig) -> str:
+        normalized = " ".join(text.split())
+        rules = config.validation_rules if config.validation_rules is not None else TextValidator.DEFAULT_RULES
+        payload = json.dumps([
+            PROMPT_VERSION, normalized, is_continuation, continues,
+            config.chars_per_line, config.lines_per_subtitle, config.max_chars, config.model_name,
+            {name: sorted(items) for name, items in rules.items()}
+        ], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Slår et svar op. Databasefejl (fx "database is locked" fra en anden instans) tælles som miss."""
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT result FROM condensations WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE condensations SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("Opslag i kondenseringscachen fejlede: %s", e)
+                self._rollback()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, result: str):
+        """Gemmer et svar. Databasefejl logges, så et allerede betalt svar ikke går tabt."""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO condensations (key, result, last_used) VALUES (?, ?, ?)",
+                    (key, result, time.time())
+                )
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM condensations").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM condensations WHERE key IN "
+                        "(SELECT key FROM condensations ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning("Kunne ikke gemme i kondenseringscachen: %s", e)
+                self._rollback()
+
+    def _rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class Rejection(NamedTuple):
+    """Begrundelse for at en tekst blev afvist: reglens navn og den tekst der ramte den"""
+    rule: str
+    match: str
+
 class TextValidator:
-    """Validerer output fra GPT."""
+    """
+    Validerer output fra GPT med ét forudkompileret regex over alle regler,
+    så hver tekst kun scannes én gang. Reglerne er navngivne lister af forbudte tekststykker.
+    """
+    DEFAULT_RULES = {
+        "ellipsis": ["..."],
+        "forbidden_chars": ["!", ";"],
+        "abbreviation": ["f.eks.", "m.m.", "osv.", "dvs.", "bl.a.", "fx", "ca."],
+    }
+
+    def __init__(self, rules: Optional[Dict[str, List[str]]] = None):
+        self.rules = rules if rules is not None else self.DEFAULT_RULES
+        groups = [
+            f"(?P<{name}>{'|'.join(re.escape(item) for item in sorted(items, key=len, reverse=True))})"
+            for name, items in self.rules.items() if items
+        ]
+        self._pattern = re.compile("|".join(groups), re.IGNORECASE) if groups else None
+        self.rejections = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, text: str) -> Optional[Rejection]:
+        """Returnerer None hvis teksten overholder reglerne, ellers den første regel der brydes"""
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text)
+        if match is None:
+            return None
+        return Rejection(match.lastgroup, match.group(0))
+
+    def review(self, text: str) -> Optional[Rejection]:
+        """Som check, men tæller afvisningerne pr. regel"""
+        rejection = self.check(text)
+        if rejection is not None:
+            with self._lock:
+                self.rejections[rejection.rule] += 1
+            logger.debug("Tekst afvist (%s: '%s'): %s", rejection.rule, rejection.match, text)
+        return rejection
+
+    def accepts(self, text: str) -> bool:
+        return self.review(text) is None
+
     @staticmethod
     def is_valid(text: str) -> bool:
-        """Validerer at teksten overholder reglerne."""
-        if "..." in text:
-            print(f"Tekst indeholder '...': {text}")
-            return False
-        if any(char in text for char in ['!', ';']):
-            print(f"Tekst indeholder forbudte tegn: {text}")
-            return False
-        abbreviations = ["f.eks.", "m.m.", "osv.", "dvs.", "bl.a.", "fx", "ca."]
-        if any(abbr in text.lower() for abbr in abbreviations):
-            print(f"Tekst indeholder forkortelser: {text}")
+        """Validerer at teksten overholder standardreglerne."""
+        return _default_validator.check(text) is None
+
+_default_validator = TextValidator()
+
+def fits_lines(text: str, chars_per_line: int, lines: int = 2) -> bool:
+    """
+    Om teksten kan deles ved ordgrænser i højst `lines` linjer à chars_per_line tegn.
+    Svarer til den deling TextFormatter.format_text i DrGensyn accepterer.
+    """
+    used = 1
+    length = 0
+    for word in text.split():
+        if len(word) > chars_per_line:
             return False
-        return True
+        if length and length + 1 + len(word) > chars_per_line:
+            used += 1
+            length = 0
+        length += len(word) + (1 if length else 0)
+    return used <= lines
+
+
+class LocalCondenser:
+    """
+    Regelbaseret kondensering uden GPT: fjerner fejlstarter, fyldord og bruger tilladte
+    sammentrækninger én ad gangen, indtil teksten kan stå på linjerne. Mislykkes det, returneres None.
+    """
+    # Fjernes kun som indskud: efter komma eller i starten af sætningen og efterfulgt af komma.
+    # Ellers bærer de ofte betydning ("Sådan er det bare").
+    FILLER_WORDS = ["altså", "jo", "ligesom", "sådan", "bare", "faktisk", "egentlig"]
+    # Svarord der aldrig fjernes i starten af sætningen ("Jo, det har vi" svarer på et nægtende spørgsmål)
+    ANSWER_WORDS = ["jo"]
+    HESITATIONS = ["øh", "øhm"]  # Tøvelyde fjernes overalt
+    # Småord hvor en gentagelse er almindeligt dansk ("det det handler om", "at at"), ikke en fejlstart
+    REPEATABLE_WORDS = ["det", "den", "de", "der", "at", "som", "om", "så", "en", "et", "og", "i"]
+    CONTRACTIONS = {"det er": "det's"}
+    TRAILING = ".,?:"
+
+    def __init__(self, chars_per_line: int, lines: int = 2, filler_words: Optional[List[str]] = None,
+                 contractions: Optional[Dict[str, str]] = None, validator: Optional[TextValidator] = None):
+        self.chars_per_line = chars_per_line
+        self.lines = lines
+        self.max_chars = chars_per_line * lines
+        self.validator = validator or _default_validator
+        self.filler_words = set(word.lower() for word in (filler_words if filler_words is not None else self.FILLER_WORDS))
+        self.hesitations = set(self.HESITATIONS)
+        self.answer_words = set(self.ANSWER_WORDS)
+        self.repeatable_words = set(self.REPEATABLE_WORDS)
+        contractions = contractions if contractions is not None else self.CONTRACTIONS
+        self.contractions = [
+            (re.compile(r"\b" + re.escape(phrase) + r"\b", re.IGNORECASE), replacement)
+            for phrase, replacement in contractions.items()
+        ]
+
+    def _bare(self, token: str) -> str:
+        return token.rstrip(self.TRAILING).lower()
+
+    def _drop_repeated(self, words: List[str]) -> bool:
+        """
+        Fjerner første fejlstart hvor et ord gentages efter komma eller tøvelyd,
+        fx 'jeg, jeg' eller 'jeg øh jeg'. Gentagne småord som 'det det' er almindeligt dansk og beholdes.
+        """
+        for i in range(1, len(words)):
+            previous = words[i - 1]
+            bare = self._bare(previous)
+            if bare in self.repeatable_words or bare in self.hesitations:
+                continue
+            if previous.endswith(",") and previous[:-1] == previous.rstrip(self.TRAILING):
+                start = i  # 'jeg, jeg'
+            elif previous == previous.rstrip(self.TRAILING) and i + 1 < len(words) \
+                    and self._bare(words[i]) in self.hesitations and words[i] == words[i].rstrip(self.TRAILING):
+                start = i + 1  # 'jeg øh jeg'
+            else:
+                continue
+            if start < len(words) and self._bare(words[start]) == bare:
+                del words[i - 1:start]
+                if previous[:1].isupper():
+                    words[i - 1] = words[i - 1][:1].upper() + words[i - 1][1:]
+                return True
+        return False
+
+    def _drop_filler(self, words: List[str]) -> bool:
+        """Fjerner første fyldord brugt som indskud og rydder op i komma og stort begyndelsesbogstav"""
+        for i, word in enumerate(words):
+            bare = self._bare(word)
+            if bare not in self.filler_words and bare not in self.hesitations:
+                continue
+            punctuation = word[len(word.rstrip(self.TRAILING)):]
+            sentence_start = i == 0 or words[i - 1].endswith((".", "?", ":"))
+            after_comma = i > 0 and words[i - 1].endswith(",")
+            if bare not in self.hesitations:
+                # "Altså, ..." og "..., altså, ..." / "..., altså." er indskud - "Sådan er det" er ikke
+                interjection = (sentence_start and punctuation == "," and bare not in self.answer_words) \
+                    or (after_comma and punctuation != "")
+                if not interjection:
+                    continue
+            if punctuation and punctuation != ",":
+                if i == 0:
+                    continue  # Et fyldord der står alene som sætning beholdes
+                words[i - 1] = words[i - 1].rstrip(",") + punctuation
+            elif punctuation == "," and i > 0 and words[i - 1].endswith(","):
+                words[i - 1] = words[i - 1][:-1]  # "var, altså, godt" -> "var godt"
+            del words[i]
+            if sentence_start and i < len(words) and word[:1].isupper():
+                words[i] = words[i][:1].upper() + words[i][1:]
+            return True
+        return False
+
+    def _contract(self, text: str) -> Optional[str]:
+        for pattern, replacement in self.contractions:
+            match = pattern.search(text)
+            if match:
+                if match.group(0)[:1].isupper():
+                    replacement = replacement[:1].upper() + replacement[1:]
+                return text[:match.start()] + replacement + text[match.end():]
+        return None
+
+    def condense(self, text: str) -> Optional[str]:
+        """Returnerer en kortere gyldig tekst der kan stå på linjerne, eller None"""
+        is_continuation = text.startswith("- ")
+        continues = text.endswith(" -")
+        core = text[2:] if is_continuation else text
+        core = core[:-2] if continues else core
+
+        def compose(words: List[str]) -> str:
+            result = " ".join(words)
+            if is_continuation:
+                result = "- " + result
+            if continues:
+                result = result + " -"
+            return result
+
+        words = core.split()
+        # Hver regel anvendes én gang ad gangen, så der ikke fjernes mere end nødvendigt.
+        # Teksten kan være for lang fordi den ikke kan deles på linjerne, ikke kun pga. længden.
+        while len(compose(words)) > self.max_chars or not fits_lines(compose(words), self.chars_per_line, self.lines):
+            if self._drop_repeated(words) or self._drop_filler(words):
+                continue
+            contracted = self._contract(" ".join(words))
+            if contracted is None:
+                return None
+            words = contracted.split()
+
+        if not words:
+            return None
+        result = compose(words)
+        if len(result) >= len(text.strip()):
+            return None  # Intet at forkorte - lad GPT tage den
+        return result if self.validator.check(result) is None else None
 
 class TextCondenser:
     """Håndterer kondensering af tekst via GPT med kontekstbevidsthed."""
@@ -52,15 +587,91 @@ class TextCondenser:
 
     def __init__(self, config):
         self.config = config
-        load_dotenv()
-        self.client = AzureOpenAI(
-            azure_endpoint=os.getenv("OPENAI_AZURE_ENDPOINT"),
-            api_key=os.getenv("OPENAI_AZURE_API_KEY"),
-            api_version="2023-06-01-preview"
+        # Klienten deles af alle condensere i processen og lukkes derfor ikke i close()
+        self.client = get_client(self.config)
+        self.scheduler = get_scheduler(self.config)
+        # Én tråd pr. temperatur for hver undertekst der kondenseres samtidig,
+        # så et helt sæt forslag kan hentes på én rundtur
+        concurrency = max(1, self.config.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.config.temperatures)) * concurrency,
+            thread_name_prefix="DrKondens"
         )
+        # Batch-puljen er separat, så en undertekst aldrig venter på en tråd som den selv optager
+        self._batch_executor = ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix="DrKondensBatch"
+        )
+        self.validator = TextValidator(self.config.validation_rules)
+        self.stats = CondensationStats()
+        self.local = None
+        self.local_hits = 0
+        self._stats_lock = threading.Lock()
+        if self.config.local_condensation:
+            self.local = LocalCondenser(self.config.chars_per_line, self.config.lines_per_subtitle,
+                                        self.config.filler_words, self.config.contractions, self.validator)
+        self.cache = None
+        if self.config.cache_path:
+            try:
+                self.cache = CondensationCache(self.config.cache_path, self.config.cache_max_entries)
+            except (sqlite3.Error, OSError) as e:
+                logger.warning("Kunne ikke åbne kondenseringscache %s: %s", self.config.cache_path, e)
+
+    def close(self):
+        """Lukker trådpuljerne uden at vente på afbrudte GPT-kald og lukker cachen"""
+        self._batch_executor.shutdown(wait=False)
+        self._executor.shutdown(wait=False)
+        if self.validator.rejections:
+            logger.info("Afviste forslag pr. regel: %s", dict(self.validator.rejections))
+        if self.local:
+            logger.info("Lokal kondensering: %d tekster klaret uden GPT", self.local_hits)
+        if self.cache:
+            logger.info("Kondenseringscache: %d hits, %d misses", self.cache.hits, self.cache.misses)
+            self.cache.close()
+            self.cache = None
+
+    def _complete(self, priority: int = PRIORITY_FIRST, kind: str = "condensation", **kwargs):
+        """Sender et chat completion-kald gennem den fælles scheduler og registrerer tokens og tid"""
+        # Groft estimat: ca. 3 tegn pr. token i prompten plus plads til svarene
+        prompt_chars = sum(len(message["content"]) for message in kwargs["messages"])
+        estimated = prompt_chars // 3 + 100 * kwargs.get("n", 1)
+        start = time.perf_counter()
+        try:
+            response = self.scheduler.call(
+                lambda: self.client.chat.completions.create(**kwargs), estimated, priority
+            )
+        except Exception:
+            self.stats.record_call(kind, time.perf_counter() - start, error=True)
+            raise
+        usage = getattr(response, "usage", None)
+        self.stats.record_call(kind, time.perf_counter() - start, usage)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.scheduler.record_usage(estimated, usage.total_tokens)
+        return response
+
+    def _accept(self, text: str, label) -> bool:
+        """Validerer et forslag og registrerer udfaldet under label (temperatur eller kaldtype)"""
+        rejection = self.validator.review(text)
+        self.stats.record_outcome(label, rejection.rule if rejection else "accepted")
+        return rejection is None
+
+    def get_stats(self) -> dict:
+        """Statistik for alle kald foretaget af denne condenser"""
+        result = self.stats.to_dict()
+        result["local_hits"] = self.local_hits
+        result["cache_hits"] = self.cache.hits if self.cache else 0
+        result["cache_misses"] = self.cache.misses if self.cache else 0
+        result["rejections"] = dict(self.validator.rejections)
+        return result
 
     def get_condensation(self, text: str, temperature: float, is_continuation: bool = False, continues: bool = False) -> Optional[str]:
         """Genererer ét kondenseringsforslag fra GPT med bevidsthed om del-sætninger."""
+        outputs = self.get_condensations(text, temperature, is_continuation, continues)
+        return outputs[0] if outputs else None
+
+    def get_condensations(self, text: str, temperature: float, is_continuation: bool = False, continues: bool = False,
+                          n: int = 1) -> List[str]:
+        """Genererer n kondenseringsforslag i ét GPT-kald og returnerer dem der overholder længden."""
         try:
             target_length = self.config.max_chars
             
@@ -78,8 +689,10 @@ class TextCondenser:
             if continues and text.endswith(" -"):
                 clean_text = text[:-2]
                 
-            print(f"Genererer forslag (temp={temperature}, fortsættelse={is_continuation}, fortsætter={continues})")
-            print(f"Target længde: {adjusted_target} tegn ({self.config.lines_per_subtitle} linjer à {self.config.chars_per_line} tegn)")
+            logger.debug("Genererer %d forslag (temp=%s, fortsættelse=%s, fortsætter=%s)",
+                         n, temperature, is_continuation, continues)
+            logger.debug("Target længde: %d tegn (%d linjer à %d tegn)",
+                         adjusted_target, self.config.lines_per_subtitle, self.config.chars_per_line)
             
             prompt = f"""
                 Omskriv denne tekst til en kortere version på omkring {adjusted_target} tegn.
@@ -93,7 +706,7 @@ class TextCondenser:
                 TEKST: {clean_text}
             """
             
-            response = self.client.chat.completions.create(
+            response = self._complete(
                 model=self.config.model_name,
                 temperature=temperature,
                 messages=[
@@ -104,21 +717,111 @@ class TextCondenser:
                     )},
                     {"role": "user", "content": prompt}
                 ],
+                **({"n": n} if n > 1 else {})
             )
-            output = response.choices[0].message.content.strip()
-            print(f"GPT output: {output} ({len(output)} tegn)")
+            outputs = []
+            for choice in response.choices:
+                output = choice.message.content.strip()
+                logger.debug("GPT output: %s (%d tegn)", output, len(output))
+                
+                # Tilføj fortsættelsesstreger igen hvis nødvendigt
+                if is_continuation and not output.startswith("- "):
+                    output = "- " + output
+                if continues and not output.endswith(" -"):
+                    output = output + " -"
+                
+                if len(output) <= target_length:
+                    outputs.append(output)
+                else:
+                    self.stats.record_outcome(temperature, "too_long")
+            return outputs
+        except Exception as e:
+            logger.warning("GPT fejl: %s", e)
+            return []
             
+    def get_condensations_batched(self, texts: List[str], temperature: float) -> List[Optional[str]]:
+        """
+        Kondenserer flere undertekster i ét GPT-kald med JSON-output.
+        Hvert svar valideres for sig, og tekster uden gyldigt svar returneres som None.
+        """
+        items = []
+        targets = []
+        for i, text in enumerate(texts):
+            is_continuation = text.startswith("- ")
+            continues = text.endswith(" -")
+            target = self.config.max_chars - (2 if is_continuation else 0) - (2 if continues else 0)
+            clean_text = text[2:] if is_continuation else text
+            clean_text = clean_text[:-2] if continues else clean_text
+            items.append({
+                "id": i,
+                "tekst": clean_text,
+                "max_tegn": target,
+                "fortsaettelse": is_continuation,
+                "fortsaetter": continues
+            })
+            targets.append((is_continuation, continues))
+
+        prompt = f"""
+            Omskriv hver tekst i listen herunder til en kortere version.
+            Hver tekst må IKKE være længere end sit eget "max_tegn", men skal ligge tæt på.
+            Teksterne kan fylde op til {self.config.lines_per_subtitle} linjer à {self.config.chars_per_line} tegn.
+            Er "fortsaettelse" sand, er teksten fortsættelsen af en sætning, så bevar stil og tone.
+            Er "fortsaetter" sand, fortsætter sætningen i næste undertekst, så afslut naturligt uden at afrunde.
+            Behandl hver tekst for sig og tilføj ikke fortsættelsesstreger.
+            
+            Svar KUN med JSON på formen {{"resultater": [{{"id": 0, "tekst": "..."}}]}}.
+            
+            TEKSTER: {json.dumps(items, ensure_ascii=False)}
+        """
+
+        try:
+            response = self._complete(
+                kind="batch",
+                model=self.config.model_name,
+                temperature=temperature,
+                messages=[
+                    {"role": "system", "content": self.SYSTEM_PROMPT.format(
+                        max_chars=self.config.max_chars,
+                        chars_per_line=self.config.chars_per_line,
+                        lines=self.config.lines_per_subtitle
+                    )},
+                    {"role": "user", "content": prompt}
+                ],
+            )
+            content = response.choices[0].message.content.strip()
+            # Modellen pakker af og til svaret ind i en kodeblok
+            if content.startswith("```"):
+                content = content.strip("`")
+                content = content[content.find("{"):]
+            answers = json.loads(content).get("resultater", [])
+        except Exception as e:
+            logger.warning("GPT fejl i samlet kald med %d tekster: %s", len(texts), e)
+            return [None] * len(texts)
+
+        results: List[Optional[str]] = [None] * len(texts)
+        for answer in answers:
+            try:
+                i = int(answer["id"])
+                output = str(answer["tekst"]).strip()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 0 <= i < len(texts) or not output:
+                continue
+
             # Tilføj fortsættelsesstreger igen hvis nødvendigt
+            is_continuation, continues = targets[i]
             if is_continuation and not output.startswith("- "):
                 output = "- " + output
             if continues and not output.endswith(" -"):
                 output = output + " -"
-            
-            return output if len(output) <= target_length else None
-        except Exception as e:
-            print(f"GPT fejl: {e}")
-            return None
-            
+
+            if len(output) > self.config.max_chars:
+                self.stats.record_outcome(f"batch {temperature:g}", "too_long")
+            elif self._accept(output, f"batch {temperature:g}"):
+                results[i] = output
+        logger.debug("Samlet kald: %d af %d tekster godkendt", sum(1 for r in results if r), len(texts))
+        return results
+
     def strict_fallback(self, text: str, is_continuation: bool = False, continues: bool = False) -> str:
         """Fallback der sikrer kondensering uden '...' og med afrundet mening."""
         # Justér target længde for fortsættelsesstreger
@@ -148,9 +851,10 @@ class TextCondenser:
         """
         
         try:
-            print("Fallback: Genererer en strikt kondensering.")
-            print(f"Fallback target: {target_length} tegn")
-            response = self.client.chat.completions.create(
+            logger.debug("Fallback: Genererer en strikt kondensering (target %d tegn)", target_length)
+            response = self._complete(
+                PRIORITY_FALLBACK,
+                kind="fallback",
                 model=self.config.model_name,
                 temperature=0.0,  # Meget præcis kondensering
                 messages=[
@@ -159,7 +863,7 @@ class TextCondenser:
                 ],
             )
             result = response.choices[0].message.content.strip()
-            print(f"Fallback-output: {result} ({len(result)} tegn)")
+            logger.debug("Fallback-output: %s (%d tegn)", result, len(result))
             
             # Tilføj fortsættelsesstreger igen hvis nødvendigt
             if is_continuation and not result.startswith("- "):
@@ -169,14 +873,31 @@ class TextCondenser:
                 
             return result
         except Exception as e:
-            print(f"Fallback-fejl: {e}")
+            logger.warning("Fallback-fejl: %s", e)
             return text  # Returnerer originalteksten som sidste udvej
 
-    def condense_text(self, text: str, progress_callback: Optional[Callable[[str], None]] = None) -> Optional[str]:
-        """Kondenserer tekst til kortere version med bevidsthed om fortsættelsesstreger."""
+    def try_local(self, text: str) -> Optional[str]:
+        """Forsøger den regelbaserede kondensering og tæller hits"""
+        if not self.local:
+            return None
+        result = self.local.condense(text)
+        if result is not None:
+            with self._stats_lock:
+                self.local_hits += 1
+            logger.debug("Lokal kondensering: %s", result)
+        return result
+
+    def condense_text(self, text: str, progress_callback: Optional[Callable[[str], None]] = None,
+                      lookup: bool = True) -> Optional[str]:
+        """
+        Kondenserer tekst til kortere version med bevidsthed om fortsættelsesstreger.
+        lookup=False springer lokal kondensering og cacheopslag over, når de allerede er prøvet
+        (tekster der fejlede i et samlet kald), så de ikke tælles to gange i statistikken.
+        """
         try:
-            print(f"Kondenserer tekst: {text}")
-            print(f"Max tilladt længde: {self.config.max_chars} tegn ({self.config.lines_per_subtitle} linjer à {self.config.chars_per_line} tegn)")
+            logger.debug("Kondenserer tekst: %s", text)
+            logger.debug("Max tilladt længde: %d tegn (%d linjer à %d tegn)",
+                         self.config.max_chars, self.config.lines_per_subtitle, self.config.chars_per_line)
             if progress_callback:
                 progress_callback("Starter kondensering med GPT")
                 
@@ -184,30 +905,88 @@ class TextCondenser:
             is_continuation = text.startswith("- ")
             continues = text.endswith(" -")
 
+            # Billige regelbaserede forkortelser først
+            if lookup:
+                local = self.try_local(text)
+                if local is not None:
+                    return local
+
+            # Slå op i cachen før der spørges GPT
+            cache_key = None
+            if self.cache:
+                cache_key = CondensationCache.make_key(text, is_continuation, continues, self.config)
+                cached = self.cache.get(cache_key) if lookup else None
+                if cached is not None:
+                    logger.debug("Fandt kondensering i cache: %s", cached)
+                    return cached
+
             # Forsøg med flere temperatures
-            proposals = []
-            for temp in self.config.temperatures:
-                condensed = self.get_condensation(text, temp, is_continuation, continues)
-                if condensed and TextValidator.is_valid(condensed):
-                    proposals.append(condensed)
+            proposals = self.collect_proposals(text, is_continuation, continues)
 
             if proposals:
                 # Vælg det længste gyldige forslag
                 best_proposal = max(proposals, key=len)
-                print(f"Valgte det længste gyldige forslag: {best_proposal} ({len(best_proposal)} tegn)")
+                logger.debug("Valgte det længste gyldige forslag: %s (%d tegn)", best_proposal, len(best_proposal))
+                if cache_key:
+                    self.cache.put(cache_key, best_proposal)
                 return best_proposal
 
             # Ingen gyldige forslag: anvend fallback
-            print("Ingen gyldige forslag fundet. Bruger fallback.")
+            logger.info("Ingen gyldige forslag fundet. Bruger fallback.")
             fallback_result = self.strict_fallback(text, is_continuation, continues)
-            if fallback_result and TextValidator.is_valid(fallback_result):
+            if fallback_result and self._accept(fallback_result, "fallback"):
+                if cache_key:
+                    self.cache.put(cache_key, fallback_result)
                 return fallback_result
 
             return None
         except Exception as e:
-            print(f"Kondenseringsfejl: {e}")
+            logger.error("Kondenseringsfejl: %s", e)
             return None
             
+    def collect_proposals(self, text: str, is_continuation: bool = False, continues: bool = False) -> List[str]:
+        """
+        Henter gyldige forslag for alle temperaturer i config-rækkefølge.
+        Med candidates_per_request > 1 hentes flere kandidater pr. kald for hver candidate_temperatures.
+        Med parallel_temperatures sendes kaldene samtidig, og med early_accept_ratio
+        returneres det første gyldige forslag der er langt nok. Ventende kald annulleres,
+        mens kald der allerede er i gang får lov at løbe færdig uden at der ventes på dem.
+        """
+        n = max(1, self.config.candidates_per_request)
+        temperatures = self.config.temperatures if n == 1 else self.config.candidate_temperatures
+        
+        if not self.config.parallel_temperatures or len(temperatures) < 2:
+            proposals = []
+            for temp in temperatures:
+                for condensed in self.get_condensations(text, temp, is_continuation, continues, n):
+                    if self._accept(condensed, temp):
+                        proposals.append(condensed)
+            return proposals
+
+        early_length = None
+        if self.config.early_accept_ratio is not None:
+            early_length = int(self.config.max_chars * self.config.early_accept_ratio)
+
+        futures = {
+            self._executor.submit(self.get_condensations, text, temp, is_continuation, continues, n): i
+            for i, temp in enumerate(temperatures)
+        }
+        results: List[List[str]] = [[] for _ in temperatures]
+        for future in as_completed(futures):
+            temp = temperatures[futures[future]]
+            valid = [condensed for condensed in future.result() if self._accept(condensed, temp)]
+            results[futures[future]] = valid
+            if early_length is not None:
+                early = [condensed for condensed in valid if len(condensed) >= early_length]
+                if early:
+                    for pending in futures:
+                        pending.cancel()
+                    logger.debug("Accepterede forslag tidligt (temp=%s, %d tegn)", temp, len(early[0]))
+                    return early[:1]
+
+        # Bevar temperaturrækkefølgen, så valget mellem lige lange forslag er det samme som sekventielt
+        return [proposal for proposals in results for proposal in proposals]
+
     @staticmethod
     def ensure_continuation_consistency(prev_text: str, current_text: str) -> Tuple[str, str]:
         """
@@ -229,24 +1008,26 @@ class TextCondenser:
             # Hvis nuværende tekst starter med stort bogstav, skal forrige teksts fortsættelsesstreg erstattes med punktum
             if current_text and current_text[0].isupper():
                 prev_text = prev_text[:-2] + "."
-                print(f"Rettet fortsættelsesstreg til punktum: {prev_text}")
+                logger.debug("Rettet fortsættelsesstreg til punktum: %s", prev_text)
             else:
                 # Nuværende tekst starter ikke med stort, men mangler fortsættelsesstreg
                 current_text = "- " + current_text
-                print(f"Tilføjet fortsættelsesstreg til start: {current_text}")
+                logger.debug("Tilføjet fortsættelsesstreg til start: %s", current_text)
         
         # Tjek om forrige tekst ikke ender med fortsættelsesstreg, men nuværende starter med fortsættelsesstreg
         elif not prev_text.endswith(" -") and current_text.startswith("- "):
             # Tilføj fortsættelsesstreg til forrige tekst, hvis den ikke allerede har punktum
             if not prev_text.endswith(".") and not prev_text.endswith("?") and not prev_text.endswith("!"):
                 prev_text = prev_text + " -"
-                print(f"Tilføjet fortsættelsesstreg til slut: {prev_text}")
+                logger.debug("Tilføjet fortsættelsesstreg til slut: %s", prev_text)
         
         return prev_text, current_text
     
     def condense_text_batch(self, texts: list, progress_callback: Optional[Callable[[str, int, int], None]] = None) -> list:
         """
         Kondenserer en batch af tekster med kontekstbevidsthed.
+        Teksterne kondenseres samtidig (op til config.max_concurrency ad gangen), og
+        fortsættelsesstregerne rettes derefter i rækkefølge, da de afhænger af naboerne.
         
         Args:
             texts: Liste af tekster der skal kondenseres
@@ -255,18 +1036,38 @@ class TextCondenser:
         Returns:
             list: Liste af kondenserede tekster
         """
-        result = []
         total = len(texts)
+        condensed_texts: List[Optional[str]] = [None] * total
+        pending = list(range(total))
+        done = 0
+        lookup = True
         
-        for i, text in enumerate(texts):
-            # Rapportér fremskridt
-            if progress_callback:
-                progress_callback(f"Kondenserer tekst {i+1}/{total}", i, total)
-            
-            # Kondenser den aktuelle tekst
-            condensed = self.condense_text(text)
+        # Med prompt_batch_size > 1 kondenseres flere tekster pr. kald, og kun de fejlede spørges enkeltvis
+        if self.config.prompt_batch_size > 1 and total > 1:
+            pending = self._condense_prompt_batches(texts, condensed_texts, progress_callback)
+            done = total - len(pending)
+            lookup = False  # Lokal kondensering og cache er allerede prøvet for de resterende
+        
+        if self.config.max_concurrency > 1 and len(pending) > 1:
+            futures = {self._batch_executor.submit(self.condense_text, texts[i], None, lookup): i for i in pending}
+            # Fremskridt rapporteres i den rækkefølge teksterne bliver færdige
+            for future in as_completed(futures):
+                condensed_texts[futures[future]] = future.result()
+                done += 1
+                if progress_callback:
+                    progress_callback(f"Kondenseret tekst {done}/{total}", done - 1, total)
+        else:
+            for i in pending:
+                # Rapportér fremskridt
+                if progress_callback:
+                    progress_callback(f"Kondenserer tekst {done+1}/{total}", done, total)
+                condensed_texts[i] = self.condense_text(texts[i], lookup=lookup)
+                done += 1
+        
+        result = []
+        for i, condensed in enumerate(condensed_texts):
             if not condensed:
-                condensed = text  # Fallback til originaltekst hvis kondensering fejler
+                condensed = texts[i]  # Fallback til originaltekst hvis kondensering fejler
             
             # Justér fortsættelsesstreger hvis der er forrige tekst
             if i > 0:
@@ -278,7 +1079,54 @@ class TextCondenser:
             
         return result
 
-def condense_texts(texts: list, chars_per_line: int = 37, lines_per_subtitle: int = 2, progress_callback: Optional[Callable[[str, int, int], None]] = None) -> list:
+    def _condense_prompt_batches(self, texts: list, condensed_texts: List[Optional[str]],
+                                 progress_callback: Optional[Callable[[str, int, int], None]] = None) -> List[int]:
+        """Udfylder condensed_texts via cache og samlede kald og returnerer indeks på de tekster der mangler"""
+        total = len(texts)
+        keys = {}
+        uncached = []
+        for i, text in enumerate(texts):
+            local = self.try_local(text)
+            if local is not None:
+                condensed_texts[i] = local
+                continue
+            if self.cache:
+                keys[i] = CondensationCache.make_key(text, text.startswith("- "), text.endswith(" -"), self.config)
+                cached = self.cache.get(keys[i])
+                if cached is not None:
+                    condensed_texts[i] = cached
+                    continue
+            uncached.append(i)
+
+        size = self.config.prompt_batch_size
+        chunks = [uncached[start:start + size] for start in range(0, len(uncached), size)]
+        temperature = self.config.temperatures[0]
+        futures = {
+            self._batch_executor.submit(self.get_condensations_batched, [texts[i] for i in chunk], temperature): chunk
+            for chunk in chunks
+        }
+
+        failed = []
+        done = total - len(uncached)
+        for future in as_completed(futures):
+            chunk = futures[future]
+            for i, condensed in zip(chunk, future.result()):
+                if condensed is None:
+                    failed.append(i)
+                    continue
+                condensed_texts[i] = condensed
+                done += 1
+                if i in keys:
+                    self.cache.put(keys[i], condensed)
+            if progress_callback:
+                progress_callback(f"Kondenseret tekst {done}/{total}", max(done - 1, 0), total)
+
+        logger.info("Samlede kald: %d kald, %d af %d tekster skal spørges enkeltvis",
+                    len(chunks), len(failed), total)
+        return sorted(failed)
+
+def condense_texts(texts: list, chars_per_line: int = 37, lines_per_subtitle: int = 2, progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                   max_concurrency: int = 8, stats: Optional[dict] = None) -> list:
     """
     Wrapper-funktion for kondensering af en batch tekster med kontekstbevidsthed.
     
@@ -287,10 +1135,18 @@ def condense_texts(texts: list, chars_per_line: int = 37, lines_per_subtitle: in
         chars_per_line: Tegn per linje (default: 37)
         lines_per_subtitle: Antal linjer per undertekst (default: 2)
         progress_callback: Callback funktion for fremskridt
+        max_concurrency: Antal tekster der kondenseres samtidig (default: 8)
+        stats: Dict der udfyldes med tokens, svartider og udfald for GPT-kaldene
         
     Returns:
         list: Liste af kondenserede tekster
     """
-    config = CondensationConfig(chars_per_line=chars_per_line, lines_per_subtitle=lines_per_subtitle)
+    config = CondensationConfig(chars_per_line=chars_per_line, lines_per_subtitle=lines_per_subtitle,
+                                max_concurrency=max_concurrency)
     condenser = TextCondenser(config)
-    return condenser.condense_text_batch(texts, progress_callback)
\ No newline at end of file
+    try:
+        return condenser.condense_text_batch(texts, progress_callback)
+    finally:
+        if stats is not None:
+            stats.update(condenser.get_stats())
+        condenser.close()
\ No newline at end of file
@@ -0,0 +1,36 @@
+import os
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger for et modul med niveauet fra <NAVN>_LOG_LEVEL, fx DRSEGMENT_LOG_LEVEL=DEBUG (standard INFO).
+    Et ukendt niveau giver en advarsel og INFO, så en stavefejl ikke stopper programmet ved import.
+    """
+    logger = logging.getLogger(name)
+    env_var = f"{name.upper()}_LOG_LEVEL"
+    value = os.environ.get(env_var, "INFO").strip().upper()
+    level = logging.getLevelName(value)  # Tal for kendte niveauer, ellers en tekst
+    if not isinstance(level, int):
+        logger.warning("Ukendt logniveau %s=%r, bruger INFO", env_var, value)
+        level = logging.INFO
+    logger.setLevel(level)
+    return logger
+
+
+def setup_logging(log_file: str = 'drgenkend.log'):
+    """
+    Sender log fra alle moduler til konsollen og log_file. Kaldes kun fra programmernes startpunkter,
+    så import af et modul ikke ændrer logningen. Modulernes egne niveauer bestemmer hvad der kommer med;
+    andre biblioteker logger fra INFO.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=LOG_FORMAT,
+        handlers=[
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
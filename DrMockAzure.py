@@ -0,0 +1,201 @@
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class MockConfig:
+    """Konfiguration for den lokale Azure OpenAI-attrap"""
+    latency_ms: float = 300.0  # Median svartid
+    latency_sigma: float = 0.3  # Spredning i den lognormale fordeling (0 = fast svartid)
+    rate_limit_prob: float = 0.0  # Andel af kald der afvises med 429
+    retry_after_sec: float = 1.0  # Værdi i Retry-After ved 429
+    seed: int = 42
+
+
+class MockStats:
+    """Tællere for kald til attrappen"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.rate_limited = 0
+            self.prompt_tokens = self.completion_tokens = 0
+
+
+def shorten(text: str, max_chars: int) -> str:
+    """Deterministisk forkortelse: behold hele ord fra starten, så længe der er plads"""
+    words = []
+    length = 0
+    for word in text.split():
+        extra = len(word) + (1 if words else 0)
+        if length + extra > max_chars - 1:  # Plads til afsluttende punktum
+            break
+        words.append(word)
+        length += extra
+    result = " ".join(words).rstrip(",.") if words else text[:max_chars - 1]
+    return result + "."
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 3)
+
+
+def answer_prompt(prompt: str, n: int) -> List[str]:
+    """Laver n svar på en prompt fra TextCondenser (enkelt tekst eller samlet JSON-kald)"""
+    if "TEKSTER:" in prompt:
+        items = json.loads(prompt.split("TEKSTER:", 1)[1].strip())
+        results = [{"id": item["id"], "tekst": shorten(item["tekst"], item["max_tegn"])} for item in items]
+        return [json.dumps({"resultater": results}, ensure_ascii=False)] * n
+
+    text = prompt.split("TEKST:", 1)[1].strip() if "TEKST:" in prompt else prompt.strip()
+    match = re.search(r"IKKE være længere end (\d+) tegn", prompt)
+    max_chars = int(match.group(1)) if match else 74
+    # Kandidat k er lidt kortere end kandidat k-1, så der er noget at vælge imellem
+    return [shorten(text, max(10, max_chars - 6 * k)) for k in range(n)]
+
+
+class MockAzureHandler(BaseHTTPRequestHandler):
+    server_version = "DrMockAzure/1.0"
+
+    def log_message(self, format, *args):
+        pass  # Ingen adgangslog - den forstyrrer benchmark-output
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[List[Tuple[str, str]]] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers or []:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server: "MockAzureServer" = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            self._send_json(404, {"error": {"code": "404", "message": "Ukendt endpoint"}})
+            return
+
+        delay, limited = server.draw()
+        with server.stats.lock:
+            server.stats.requests += 1
+            if limited:
+                server.stats.rate_limited += 1
+        time.sleep(delay)
+
+        if limited:
+            retry_after = server.config.retry_after_sec
+            self._send_json(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, [
+                ("Retry-After", str(max(1, int(round(retry_after))))),
+                ("retry-after-ms", str(int(retry_after * 1000)))
+            ])
+            return
+
+        messages = request.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        n = int(request.get("n", 1))
+        answers = answer_prompt(prompt, n)
+
+        prompt_tokens = sum(estimate_tokens(message.get("content", "")) for message in messages)
+        completion_tokens = sum(estimate_tokens(answer) for answer in answers)
+        with server.stats.lock:
+            server.stats.prompt_tokens += prompt_tokens
+            server.stats.completion_tokens += completion_tokens
+
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{server.stats.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [
+                {"index": i, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}
+                for i, answer in enumerate(answers)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+
+class MockAzureServer(ThreadingHTTPServer):
+    """Lokal stand-in for Azure OpenAI chat completions med styrbar svartid og 429-fejl"""
+    daemon_threads = True
+    request_queue_size = 128  # Standardkøen på 5 giver forbindelsesfejl ved høj samtidighed
+
+    def __init__(self, address: Tuple[str, int], config: Optional[MockConfig] = None):
+        super().__init__(address, MockAzureHandler)
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self._random = random.Random(self.config.seed)
+        self._random_lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self) -> Tuple[float, bool]:
+        """Trækker svartid og om kaldet skal afvises, fra en seedet generator"""
+        with self._random_lock:
+            factor = self._random.lognormvariate(0.0, self.config.latency_sigma) if self.config.latency_sigma > 0 else 1.0
+            limited = self._random.random() < self.config.rate_limit_prob
+        return self.config.latency_ms * factor / 1000.0, limited
+
+
+def start_server(config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> MockAzureServer:
+    """Starter attrappen i en baggrundstråd. Port 0 vælger en ledig port."""
+    server = MockAzureServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name="DrMockAzure", daemon=True)
+    thread.start()
+    return server
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Lokal Azure OpenAI-attrap til belastningstest af DrKondens")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--rate-limit-prob", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        rate_limit_prob=args.rate_limit_prob,
+        retry_after_sec=args.retry_after,
+        seed=args.seed
+    )
+    server = MockAzureServer((args.host, args.port), config)
+    print(f"Mock Azure OpenAI kører på {server.endpoint} - sæt OPENAI_AZURE_ENDPOINT til denne adresse")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
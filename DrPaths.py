@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Vedvarende data (caches og jobfil) ligger ét sted pr. bruger i stedet for i den mappe programmet startes fra,
+# så cachehits og genoptagne jobs ikke afhænger af startmappen
+
+
+def data_dir() -> str:
+    """Datamappen: DRGENSYN_DATA_DIR hvis sat, ellers %LOCALAPPDATA%\\DrGensyn på Windows og ~/.drgensyn andre steder"""
+    override = os.environ.get("DRGENSYN_DATA_DIR")
+    if override:
+        return os.path.expanduser(override)
+    if sys.platform == "win32" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "DrGensyn")
+    return os.path.join(os.path.expanduser("~"), ".drgensyn")
+
+
+def data_path(path: str) -> str:
+    """Lægger en relativ sti i datamappen og opretter mappen ved første brug. Absolutte stier bruges som de er."""
+    path = os.path.expanduser(path)
+    if not os.path.isabs(path):
+        path = os.path.join(data_dir(), path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -1,9 +1,31 @@
+import os
 import json
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
 import pysrt
-import spacy
 from dataclasses import dataclass
-from typing import List, Optional, Callable, Dict, Any
+from typing import List, Optional, Callable, Dict, Any, Iterable, Iterator
 from collections import Counter
+from DrLog import get_logger
+
+# Niveauet kan sættes pr. modul, fx DRSEGMENT_LOG_LEVEL=DEBUG for at spore opdelingen
+logger = get_logger('DrSegment')
+
+SPLIT_ENGINES = ("greedy", "dp")
+
+# Omkostninger for dp-motoren. Grænser efter tegnsætning er gratis, syntaktiske
+# grænser koster lidt og vilkårlige ordgrænser koster mest.
+DP_BOUNDARY_COST = {"punctuation": 0.0, "syntax": 2.0, "word": 6.0}
+DP_SEGMENT_COST = 5.0  # Pr. segment, så vi ikke deler mere end nødvendigt
+DP_BALANCE_WEIGHT = 4.0  # Straf for ujævne segmenter (kvadratisk i varighed)
+DP_OVER_DURATION_COST = 100.0  # Pr. sekund over max varighed
+# Et tegn over max_chars koster mere end et ekstra segment under minimum varighed kan, så max_chars
+# kun overskrides når der ingen ordgrænse er at dele ved (fx ved meget hurtig tale med lange ord)
+DP_OVER_CHARS_COST = 100.0  # Pr. tegn over max_chars
+DP_SHORT_COST = 10.0  # Pr. sekund under minimum varighed
+
 
 @dataclass
 class SegmentConfig:
@@ -12,12 +34,61 @@ class SegmentConfig:
     min_gap_frames: int = 4  # Minimum 4 frames mellem undertekster
     merge_threshold_sec: float = 7.0  # Standardværdi for sammenslåning af undertekster
     max_subtitle_duration_sec: float = 7.0  # Maksimal varighed for en undertekst
+    spacy_batch_size: int = 32  # Antal segmenter pr. batch i nlp.pipe
+    spacy_n_process: int = 1  # Antal processer til nlp.pipe (1 = i samme proces)
+    spacy_max_lookahead: int = 1000  # Højeste antal undertekster der holdes tilbage mens en spaCy-batch samles
+    split_engine: str = "greedy"  # "greedy" eller "dp" (global optimering af split points)
+    min_segment_duration_sec: float = 2.0  # Minimum varighed for et delt segment
+    max_chars: int = 74  # 2 linjer à 37 tegn
+    
+    def __post_init__(self):
+        if self.split_engine not in SPLIT_ENGINES:
+            raise ValueError(f"Ukendt split_engine: {self.split_engine} (vælg mellem {', '.join(SPLIT_ENGINES)})")
     
     @property
     def min_gap_ms(self) -> int:
         return self.frame_duration_ms * self.min_gap_frames
 
 
+# Sprogmodeller i prioriteret rækkefølge (dansk først, engelsk som fallback)
+SPACY_MODELS = ["da_core_news_sm", "en_core_web_sm"]
+
+# Komponenter vi ikke bruger - _find_split_candidates læser kun token.dep_ fra parseren
+SPACY_EXCLUDE = ["ner", "lemmatizer", "attribute_ruler", "morphologizer", "tagger", "senter"]
+
+_nlp_lock = threading.Lock()
+_nlp_models: Dict[tuple, Any] = {}  # Delt mellem alle SRTGenerator-instanser og tråde
+
+
+def get_nlp(models: Optional[List[str]] = None):
+    """Returnerer den delte sprogmodel og indlæser den først ved første brug"""
+    key = tuple(models or SPACY_MODELS)
+    if key in _nlp_models:
+        return _nlp_models[key]
+
+    with _nlp_lock:
+        # En anden tråd kan have indlæst modellen mens vi ventede
+        if key in _nlp_models:
+            return _nlp_models[key]
+
+        nlp = None
+        try:
+            import spacy
+            for name in key:
+                try:
+                    nlp = spacy.load(name, exclude=SPACY_EXCLUDE)
+                    break
+                except OSError:
+                    continue
+        except ImportError:
+            pass
+
+        if nlp is None:
+            logger.warning("Ingen sprogmodel tilgængelig - vil bruge simpel opdeling")
+        _nlp_models[key] = nlp  # Gem også None, så vi ikke forsøger igen for hver undertekst
+        return nlp
+
+
 def attach_punctuation(words: List[tuple]) -> List[str]:
     """Fjerner mellemrum før tegnsætning"""
     result = []
@@ -43,20 +114,324 @@ def attach_punctuation(words: List[tuple]) -> List[str]:
     return result
 
 
+# Kodning af type og tilknytning i WordTimings.codes
+PUNCTUATION = 1  # Sat for tegnsætning, ellers er elementet et ord
+ATTACHED = 2  # Sat hvis elementet hænger på det forrige (attaches_to == "previous")
+
+
+class StringTable:
+    """Internerer ord, så hvert forskelligt ord kun gemmes én gang"""
+    __slots__ = ("ids", "strings")
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, word: str) -> int:
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = len(self.strings)
+            self.ids[word] = word_id
+            self.strings.append(word)
+        return word_id
+
+
+class WordTimings:
+    """
+    Kolonnebaseret lager for ord-timings: start- og sluttider som float-arrays,
+    type/tilknytning som én lille kode og ordene som id'er i en delt StringTable.
+    """
+    __slots__ = ("starts", "ends", "codes", "word_ids", "table")
+
+    def __init__(self, table: Optional[StringTable] = None):
+        self.table = table if table is not None else StringTable()
+        self.starts = array("d")
+        self.ends = array("d")
+        self.codes = array("b")
+        self.word_ids = array("i")
+
+    @classmethod
+    def from_dicts(cls, timings: List[Dict], table: Optional[StringTable] = None) -> "WordTimings":
+        """Bygger et lager ud fra den gamle liste af dicts (word, start, end, type, attaches_to)"""
+        store = cls(table)
+        for t in timings:
+            store.append(t["word"], t["start"], t["end"], t["type"] == "punctuation", t.get("attaches_to") == "previous")
+        return store
+
+    def append(self, word: str, start: float, end: float, punctuation: bool = False, attached: bool = False):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.codes.append((PUNCTUATION if punctuation else 0) | (ATTACHED if attached else 0))
+        self.word_ids.append(self.table.intern(word))
+
+    def append_result(self, item: Dict):
+        """Tilføjer ét ord eller tegn fra resultaterne"""
+        self.append(
+            item["alternatives"][0]["content"],
+            item["start_time"],
+            item.get("end_time", item["start_time"]),
+            item["type"] == "punctuation",
+            item.get("attaches_to") == "previous"
+        )
+
+    def extend(self, other: "WordTimings"):
+        self.starts.extend(other.starts)
+        self.ends.extend(other.ends)
+        self.codes.extend(other.codes)
+        if other.table is self.table:
+            self.word_ids.extend(other.word_ids)
+        else:
+            strings = other.table.strings
+            self.word_ids.extend(array("i", (self.table.intern(strings[i]) for i in other.word_ids)))
+
+    def take(self, indices: List[int]) -> "WordTimings":
+        """Nyt lager med elementerne på de givne positioner"""
+        store = WordTimings(self.table)
+        store.starts = array("d", (self.starts[i] for i in indices))
+        store.ends = array("d", (self.ends[i] for i in indices))
+        store.codes = array("b", (self.codes[i] for i in indices))
+        store.word_ids = array("i", (self.word_ids[i] for i in indices))
+        return store
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, key: slice) -> "WordTimings":
+        store = WordTimings(self.table)
+        store.starts = self.starts[key]
+        store.ends = self.ends[key]
+        store.codes = self.codes[key]
+        store.word_ids = self.word_ids[key]
+        return store
+
+    def word(self, i: int) -> str:
+        return self.table.strings[self.word_ids[i]]
+
+    def is_word(self, i: int) -> bool:
+        return not self.codes[i] & PUNCTUATION
+
+    def is_attached(self, i: int) -> bool:
+        return bool(self.codes[i] & ATTACHED)
+
+
+def build_timings(results: List[Dict], table: Optional[StringTable] = None) -> WordTimings:
+    """Bygger timing-lageret for alle ord og tegn i resultaterne"""
+    timings = WordTimings(table)
+    for item in results:
+        if item["type"] == "word" or item["type"] == "punctuation":
+            timings.append_result(item)
+    return timings
+
+
+class _JsonStream:
+    """Minimal inkrementel JSON-læser oven på json.JSONDecoder.raw_decode"""
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        # Læs mindst lige så meget som der ligger ubrugt, så store værdier ikke parses igen og igen
+        chunk = self.f.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"Ugyldig JSON: forventede {chars!r}, fik {c!r}")
+        self.pos += 1
+        return c
+
+    def decode(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # Et tal kan være afkortet ved bufferens ende (fx "2." af "2.5") - læs mere og prøv igen
+                truncated = end == len(self.buf) or (
+                    isinstance(value, (int, float)) and self.buf[end] in "0123456789.eE+-"
+                )
+                if not truncated or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def iter_json_results(path: str, header: Optional[Dict[str, Any]] = None, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """
+    Læser "results" fra en json-v2 fil ét element ad gangen uden at indlæse hele filen.
+    Øvrige nøgler på øverste niveau (job, metadata osv.) gemmes i header, efterhånden som de læses.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            if key == "results":
+                stream.expect("[")
+                if stream.peek() == "]":
+                    stream.expect("]")
+                else:
+                    while True:
+                        yield stream.decode()
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                value = stream.decode()
+                if header is not None:
+                    header[key] = value
+            if stream.expect(",}") == "}":
+                break
+
+
+def next_word_indices(timings: WordTimings) -> List[Optional[int]]:
+    """Index for første ord fra og med hver position (None hvis der ikke kommer flere ord)"""
+    codes = timings.codes
+    next_word: List[Optional[int]] = [None] * (len(codes) + 1)
+    for i in range(len(codes) - 1, -1, -1):
+        next_word[i] = next_word[i + 1] if codes[i] & PUNCTUATION else i
+    return next_word
+
+
+def word_positions(timings: WordTimings) -> List[int]:
+    """Positionerne for ordene (ikke tegnsætning) i timings"""
+    return [i for i, code in enumerate(timings.codes) if not code & PUNCTUATION]
+
+
+def syntax_text(timings: WordTimings) -> str:
+    """Teksten spaCy skal parse - kun ord, så token-indeks svarer til ord-indeks"""
+    strings = timings.table.strings
+    word_ids = timings.word_ids
+    return " ".join(strings[word_ids[i]] for i in word_positions(timings))
+
+
+def has_nearby_candidate(candidates: List[int], idx: int, distance: int) -> bool:
+    """Tjekker om en sorteret kandidatliste har et punkt tættere end distance på idx"""
+    pos = bisect_left(candidates, idx)
+    if pos < len(candidates) and candidates[pos] - idx < distance:
+        return True
+    return pos > 0 and idx - candidates[pos - 1] < distance
+
+
+class TimingIndex:
+    """Sorteret start/slut-indeks over ord-timings til opslag i O(log n)"""
+    def __init__(self, timings: WordTimings):
+        # Resultaterne er kronologiske, men vi sorterer stabilt for en sikkerheds skyld
+        starts = timings.starts
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            timings = timings.take(sorted(range(len(starts)), key=starts.__getitem__))
+        self.timings = timings
+
+    def window(self, start: float, end: float, tolerance: float = 0.1) -> WordTimings:
+        """Finder alle timings der ligger inden for [start, end] med tolerance"""
+        starts = self.timings.starts
+        ends = self.timings.ends
+        lo = bisect_left(starts, start - tolerance)
+        hi = bisect_right(starts, end + tolerance, lo)
+        indices = [i for i in range(lo, hi) if ends[i] <= end + tolerance]
+        if len(indices) == hi - lo:
+            return self.timings[lo:hi]
+        return self.timings.take(indices)
+
+
+def format_srt_time(ms: int) -> str:
+    """Formaterer millisekunder som SRT-tid (HH:MM:SS,mmm) - negative tider vises som nul ligesom i pysrt"""
+    ms = max(ms, 0)
+    seconds, millis = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{millis:03d}"
+
+
+class Subtitle:
+    """Letvægts undertekst til segmenteringen med tider i hele millisekunder"""
+    __slots__ = ("index", "start_ms", "end_ms", "text", "speaker", "timings")
+
+    def __init__(self, index: int, start_ms: int, end_ms: int, text: str,
+                 speaker: Optional[str] = None, timings: Optional[WordTimings] = None):
+        self.index = index
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.text = text
+        self.speaker = speaker
+        self.timings = timings
+
+    def to_pysrt(self) -> pysrt.SubRipItem:
+        srt_item = pysrt.SubRipItem(
+            index=self.index,
+            start=pysrt.SubRipTime.from_ordinal(self.start_ms),
+            end=pysrt.SubRipTime.from_ordinal(self.end_ms),
+            text=self.text
+        )
+        if self.speaker is not None:
+            srt_item.speaker = self.speaker
+        return srt_item
+
+    def to_srt(self) -> str:
+        return f"{self.index}\n{format_srt_time(self.start_ms)} --> {format_srt_time(self.end_ms)}\n{self.text}\n"
+
+
+def write_srt(subtitles: Iterable[Subtitle], path: str) -> int:
+    """
+    Skriver undertekster direkte som SRT-tekst og returnerer antallet.
+    Der skrives til en midlertidig fil i samme mappe, som først erstatter målet når alt er skrevet,
+    så en fejl undervejs ikke efterlader en halv SRT-fil.
+    """
+    count = 0
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for subtitle in subtitles:
+                f.write(subtitle.to_srt())
+                f.write("\n")
+                count += 1
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+
 class SRTGenerator:
     def __init__(self, config: Optional[SegmentConfig] = None):
         self.config = config or SegmentConfig()
         self._raw_results = None
-        try:
-            self.nlp = spacy.load("da_core_news_sm")  # Dansk sprogmodel
-        except OSError:
-            try:
-                self.nlp = spacy.load("en_core_web_sm")  # Fallback til engelsk model
-            except OSError:
-                print("Advarsel: Ingen sprogmodel tilgængelig - vil bruge simpel opdeling")
-                self.nlp = None
+        self._timings = None
+        self._timing_index = None
+        self._strings = StringTable()  # Fælles ordtabel for alle timing-lagre fra denne generator
 
-    def generate_metadata_subtitle(self, json_data: Dict[str, Any]) -> pysrt.SubRipItem:
+    @property
+    def nlp(self):
+        """Sprogmodellen indlæses først når en undertekst kræver syntaktisk opdeling"""
+        return get_nlp()
+
+    def generate_metadata_subtitle(self, json_data: Dict[str, Any]) -> Subtitle:
         """Genererer undertekst med metadata"""
         job_data = json_data.get("job", {})
         metadata = json_data.get("metadata", {})
@@ -69,18 +444,19 @@ class SRTGenerator:
             f"Configuration: Enhanced={transcription_config.get('operating_point', 'Unknown')}"
         ]
         
-        return pysrt.SubRipItem(
+        return Subtitle(
             index=1,
-            start=pysrt.SubRipTime(0, 0, 0, 0),
-            end=pysrt.SubRipTime(0, 0, 0, 320),  # 8 frames ved 25 FPS
+            start_ms=0,
+            end_ms=320,  # 8 frames ved 25 FPS
             text="\n".join(null_text)
         )
 
-    def build_text_from_timings(self, timings: List[Dict]) -> str:
+    def build_text_from_timings(self, timings: WordTimings) -> str:
         """Byg tekst fra timing data med korrekt tegnsætning og mellemrum"""
         text = []
-        for i, timing in enumerate(timings):
-            if timing["type"] == "word":
+        for i in range(len(timings)):
+            word = timings.word(i)
+            if timings.is_word(i):
                 needs_space = False
                 
                 # Tilføj mellemrum hvis:
@@ -90,107 +466,139 @@ class SRTGenerator:
                 if len(text) > 0:
                     prev_was_comma = (
                         i > 0 and 
-                        timings[i-1]["type"] == "punctuation" and 
-                        timings[i-1]["word"] in [",", ";", ":", "."]
+                        not timings.is_word(i - 1) and 
+                        timings.word(i - 1) in [",", ";", ":", "."]
                     )
                     # Altid mellemrum efter komma, men ellers kun hvis ikke sidste endte med bindestreg
                     if prev_was_comma or (not text[-1].endswith("-")):
                         needs_space = True
                 
-                word = " " + timing["word"] if needs_space else timing["word"]
-                text.append(word)
+                text.append(" " + word if needs_space else word)
                 
             else:  # punctuation
                 # For tegnsætning, tilføj direkte til sidste ord uden mellemrum
                 if text:
-                    text[-1] = text[-1] + timing["word"]
+                    text[-1] = text[-1] + word
                 else:
                     # Hvis der ikke er noget ord at tilføje til, opret nyt element
                     # MEN, vi vil ikke have punktum i starten
-                    if timing["word"] not in [".", "!"]:
-                        text.append(timing["word"])
+                    if word not in [".", "!"]:
+                        text.append(word)
         
         result = "".join(text)
-        print(f"      DEBUG: Built text: '{result}'")  # Debug output
+        logger.debug("Built text: '%s'", result)
         return result
 
-    def _find_split_candidates(self, timings: List[Dict]) -> List[int]:
-        """Find alle mulige split points sorteret efter prioritet"""
-        total_duration = timings[-1]["end"] - timings[0]["start"]
-        min_segment_duration = 2.0  # Minimum 2 sekunder per segment
+    def _comma_candidates(self, timings: WordTimings) -> List[int]:
+        """Find split points efter kommaer, sorteret stigende"""
+        min_segment_duration = self.config.min_segment_duration_sec
+        starts, ends = timings.starts, timings.ends
+        segment_start = starts[0]
+        segment_end = ends[-1]
         candidates = []
         
+        # Kommaet er ét interneret ord - findes det ikke i tabellen, er der ingen kommaer
+        comma_id = timings.table.ids.get(",")
+        if comma_id is None:
+            return candidates
+        next_word = next_word_indices(timings)
+        codes, word_ids = timings.codes, timings.word_ids
+        
         # Find alle kommaer der giver fornuftige splits
-        for i, timing in enumerate(timings[:-1]):  # Undgå sidste element
+        for i in range(len(timings) - 1):  # Undgå sidste element
             # Kun check på kommaer
-            if timing["type"] == "punctuation" and timing["word"] == ",":
+            if codes[i] & PUNCTUATION and word_ids[i] == comma_id:
                 # Find det næste ord efter kommaet
-                next_word_idx = None
-                for j in range(i + 1, len(timings)):
-                    if timings[j]["type"] == "word":
-                        next_word_idx = j
-                        break
-                
+                next_word_idx = next_word[i + 1]
                 if next_word_idx is None:
                     continue
                     
                 # Check varigheder før og efter dette komma
-                left_duration = timing["end"] - timings[0]["start"]
-                right_duration = timings[-1]["end"] - timings[next_word_idx]["start"]
+                left_duration = ends[i] - segment_start
+                right_duration = segment_end - starts[next_word_idx]
                 
                 if (left_duration >= min_segment_duration and 
                     right_duration >= min_segment_duration):
                     # Gem indexet for ordet efter kommaet
                     candidates.append(next_word_idx)
         
+        return candidates
+
+    def _find_split_candidates(self, timings: WordTimings, doc=None) -> List[int]:
+        """Find alle mulige split points sorteret efter prioritet"""
+        min_segment_duration = self.config.min_segment_duration_sec
+        starts, ends = timings.starts, timings.ends
+        segment_start = starts[0]
+        segment_end = ends[-1]
+        candidates = self._comma_candidates(timings)  # Holdes sorteret stigende
+        
         # Hvis vi ikke har nok kommaer og har Spacy, find syntaktiske splits
-        if len(candidates) < 1 and self.nlp:
-            text = " ".join(t["word"] for t in timings if t["type"] == "word")
-            doc = self.nlp(text)
-            
+        if len(candidates) < 1 and (doc is not None or self.nlp):
             # Byg mapping mellem tokens og timing indices
-            token_to_idx = {}
-            word_count = 0
-            for i, t in enumerate(timings):
-                if t["type"] == "word":
-                    token_to_idx[word_count] = i
-                    word_count += 1
+            positions = word_positions(timings)
+            if doc is None:
+                doc = self.nlp(syntax_text(timings))
             
             # Find potentielle splits ved præpositioner og ledsætninger
             for token in doc:
-                if token.i not in token_to_idx:
+                if token.i >= len(positions):
                     continue
                 
-                timing_idx = token_to_idx[token.i]
+                timing_idx = positions[token.i]
                 
                 # Undgå splits tæt på eksisterende
-                if any(abs(timing_idx - c) < 3 for c in candidates):
+                if has_nearby_candidate(candidates, timing_idx, 3):
                     continue
                 
                 # Check kun præpositioner og ledsætningsmarkører
                 if token.dep_ in ["prep", "mark"]:
-                    left_duration = timings[timing_idx]["end"] - timings[0]["start"]
-                    right_duration = timings[-1]["end"] - timings[timing_idx]["start"]
+                    left_duration = ends[timing_idx] - segment_start
+                    right_duration = segment_end - starts[timing_idx]
                     
                     if (left_duration >= min_segment_duration and 
                         right_duration >= min_segment_duration):
-                        candidates.append(timing_idx)
+                        insort(candidates, timing_idx)
         
         # Sortér kandidater efter position (bagfra)
-        return sorted(candidates, reverse=True)
+        return candidates[::-1]
+
+    def _needs_parse(self, timings: WordTimings) -> bool:
+        """Om et segment er for langt og kun kan deles syntaktisk"""
+        return (timings.ends[-1] - timings.starts[0] > self.config.max_subtitle_duration_sec
+                and not self._comma_candidates(timings))
+
+    def parse_segments(self, segments: List[WordTimings]) -> List[Any]:
+        """Parser alle lange segmenter uden kommakandidater samlet med nlp.pipe"""
+        docs: List[Any] = [None] * len(segments)
+        pending = [i for i, timings in enumerate(segments) if self._needs_parse(timings)]
+        # Sprogmodellen indlæses kun hvis mindst ét segment har brug for den
+        if not pending or not self.nlp:
+            return docs
+        
+        logger.info("Parser %d segmenter med spaCy", len(pending))
+        texts = [syntax_text(segments[i]) for i in pending]
+        parsed = self.nlp.pipe(
+            texts,
+            batch_size=self.config.spacy_batch_size,
+            n_process=self.config.spacy_n_process
+        )
+        for i, doc in zip(pending, parsed):
+            docs[i] = doc
+        return docs
 
-    def find_split_points(self, timings: List[Dict], max_duration: float) -> List[int]:
+    def find_split_points(self, timings: WordTimings, max_duration: float, doc=None) -> List[int]:
         """Find optimale split points for at holde segmenter under max_duration"""
-        total_duration = timings[-1]["end"] - timings[0]["start"]
+        starts, ends = timings.starts, timings.ends
+        total_duration = ends[-1] - starts[0]
         if total_duration <= max_duration:
             return []
             
-        print(f"      DEBUG: Finding splits for duration {total_duration:.1f}s (max {max_duration:.1f}s)")
+        logger.debug("Finding splits for duration %.1fs (max %.1fs)", total_duration, max_duration)
         
         # Find alle potentielle split points
-        candidates = self._find_split_candidates(timings)
+        candidates = self._find_split_candidates(timings, doc)
         if not candidates:
-            print("      DEBUG: No candidates found")
+            logger.debug("No candidates found")
             return []
         
         # Find nødvendige splits
@@ -202,8 +610,8 @@ class SRTGenerator:
             if split_idx <= current_start:
                 continue
                 
-            segment_duration = timings[split_idx]["end"] - timings[current_start]["start"]
-            print(f"      DEBUG: Checking segment {current_start} to {split_idx}: {segment_duration:.1f}s")
+            segment_duration = ends[split_idx] - starts[current_start]
+            logger.debug("Checking segment %d to %d: %.1fs", current_start, split_idx, segment_duration)
             
             if segment_duration > max_duration:
                 # Hvis dette segment er for langt, brug forrige split
@@ -212,30 +620,130 @@ class SRTGenerator:
                 continue
             
             # Check varigheden af det resterende segment
-            remaining_duration = timings[-1]["end"] - timings[split_idx]["end"]
+            remaining_duration = ends[-1] - ends[split_idx]
             if remaining_duration <= max_duration:
                 # Dette split giver to gode segmenter
                 splits.append(split_idx)
-                print(f"      DEBUG: Added split at {split_idx}")
+                logger.debug("Added split at %d", split_idx)
                 break
             
             # Ellers tilføj dette split og fortsæt
             splits.append(split_idx)
             current_start = split_idx
-            print(f"      DEBUG: Added intermediate split at {split_idx}")
+            logger.debug("Added intermediate split at %d", split_idx)
         
-        print(f"      DEBUG: Final splits: {splits}")
+        logger.debug("Final splits: %s", splits)
         return splits
 
-    def process_results(self, results: List[Dict]) -> List[pysrt.SubRipItem]:
-        """Behandler resultater fra JSON og laver undertekster"""
-        self._raw_results = results.copy()
-        srt_items = []
+    def find_split_points_dp(self, timings: WordTimings, max_duration: float, doc=None) -> List[int]:
+        """Finder globalt optimale split points med dynamisk programmering over ordgrænserne"""
+        n = len(timings)
+        starts, ends, codes = timings.starts, timings.ends, timings.codes
+        total_duration = ends[-1] - starts[0]
+        if total_duration <= max_duration:
+            return []
+        
+        # Syntaktiske grænser bruges som i den grådige motor kun når der ingen kommaer er
+        syntax_positions = set()
+        if doc is None and not self._comma_candidates(timings) and self.nlp:
+            doc = self.nlp(syntax_text(timings))
+        if doc is not None:
+            positions = word_positions(timings)
+            for token in doc:
+                if token.i < len(positions) and token.dep_ in ["prep", "mark"]:
+                    syntax_positions.add(positions[token.i])
+        
+        # Mulige grænser: starten, hvert ord der ikke hænger på det forrige, og slutningen
+        boundaries = [0]
+        boundary_cost = [0.0]
+        for i in range(1, n):
+            if codes[i]:  # Tegnsætning eller ord der hænger på det forrige
+                continue
+            if codes[i - 1] & PUNCTUATION and timings.word(i - 1) in [",", ".", "?", "!", ";", ":"]:
+                cost = DP_BOUNDARY_COST["punctuation"]
+            elif i in syntax_positions:
+                cost = DP_BOUNDARY_COST["syntax"]
+            else:
+                cost = DP_BOUNDARY_COST["word"]
+            boundaries.append(i)
+            boundary_cost.append(cost)
+        boundaries.append(n)
+        boundary_cost.append(0.0)
+        
+        # Præfikssummer af tegn (ord får et mellemrum foran, tegnsætning hænger på)
+        char_prefix = [0] * (n + 1)
+        strings = timings.table.strings
+        for i, word_id in enumerate(timings.word_ids):
+            char_prefix[i + 1] = char_prefix[i] + len(strings[word_id]) + (0 if codes[i] & PUNCTUATION else 1)
+        
+        min_duration = self.config.min_segment_duration_sec
+        max_chars = self.config.max_chars
+        m = len(boundaries)
+        best = [float("inf")] * m
+        back = [0] * m
+        best[0] = 0.0
+        
+        for a in range(m - 1):
+            if best[a] == float("inf"):
+                continue
+            start_idx = boundaries[a]
+            segment_start = starts[start_idx]
+            # Kun grænser inden for max varighed (plus den første udenfor) undersøges,
+            # så hver blok behandles i tid proportional med antal ord
+            for b in range(a + 1, m):
+                end_idx = boundaries[b]
+                duration = ends[end_idx - 1] - segment_start
+                chars = char_prefix[end_idx] - char_prefix[start_idx] - 1
+                if start_idx > 0:
+                    chars += 2  # "- " i starten
+                if end_idx < n:
+                    chars += 2  # " -" i slutningen
+                
+                cost = DP_SEGMENT_COST + boundary_cost[b]
+                cost += DP_BALANCE_WEIGHT * (duration / max_duration) ** 2
+                if duration > max_duration:
+                    cost += DP_OVER_DURATION_COST * (1.0 + duration - max_duration)
+                if chars > max_chars:
+                    cost += DP_OVER_CHARS_COST * (10 + chars - max_chars)
+                if duration < min_duration:
+                    cost += DP_SHORT_COST * (min_duration - duration)
+                
+                if best[a] + cost < best[b]:
+                    best[b] = best[a] + cost
+                    back[b] = a
+                
+                if duration > max_duration:
+                    break
+        
+        # Følg tilbagepegerne fra slutningen
+        splits = []
+        b = m - 1
+        while b > 0:
+            b = back[b]
+            if b > 0:
+                splits.append(boundaries[b])
+        splits.reverse()
+        logger.debug("DP splits: %s", splits)
+        return splits
+
+    def select_split_points(self, timings: WordTimings, max_duration: float, doc=None) -> List[int]:
+        """Finder split points med den motor der er valgt i SegmentConfig"""
+        if self.config.split_engine == "dp":
+            return self.find_split_points_dp(timings, max_duration, doc)
+        return self.find_split_points(timings, max_duration, doc)
+
+    def iter_blocks(self, results: Iterable[Dict]) -> Iterator[Subtitle]:
+        """Laver en undertekst pr. sætning (is_eos) efterhånden som resultaterne læses"""
+        block_count = 0
         current_block = []
+        block_timings = WordTimings(self._strings)  # Blokkens egne ord-timings, så senere trin ikke skal slå dem op
         block_start_time = None
         speaker_counts = Counter()
         
         for item in results:
+            if item["type"] == "word" or item["type"] == "punctuation":
+                block_timings.append_result(item)
+
             if item["type"] == "word":
                 word_data = item.get("alternatives", [{}])[0]
                 word = word_data.get("content", "")
@@ -259,80 +767,94 @@ class SRTGenerator:
                     dominant_speaker = speaker_counts.most_common(1)[0][0] if speaker_counts else "Unknown"
                     block_text = " ".join(attach_punctuation(current_block))
                     
-                    srt_item = pysrt.SubRipItem(
-                        index=len(srt_items) + 2,  # +2 fordi metadata er index 1
-                        start=pysrt.SubRipTime.from_ordinal(int(block_start_time * 1000)),
-                        end=pysrt.SubRipTime.from_ordinal(int(item.get("end_time", 0) * 1000)),
-                        text=block_text
+                    block_count += 1
+                    yield Subtitle(
+                        index=block_count + 1,  # +1 fordi metadata er index 1
+                        start_ms=int(block_start_time * 1000),
+                        end_ms=int(item.get("end_time", 0) * 1000),
+                        text=block_text,
+                        speaker=dominant_speaker,
+                        timings=block_timings
                     )
-                    srt_item.speaker = dominant_speaker
-                    srt_items.append(srt_item)
                 
                 current_block = []
+                block_timings = WordTimings(self._strings)
                 block_start_time = None
                 speaker_counts.clear()
-        
-        return srt_items
 
-    def split_long_subtitles(self, srt_items: List[pysrt.SubRipItem]) -> List[pysrt.SubRipItem]:
-        """Del lange undertekster i mindre blokke baseret på kommaer og syntaks"""
+    def process_results(self, results: List[Dict]) -> List[Subtitle]:
+        """Behandler resultater fra JSON og laver undertekster"""
+        # Gem kun en reference - resultaterne bruges kun som fallback for undertekster uden timings
+        self._raw_results = results
+        self._timings = None
+        self._timing_index = None
+        return list(self.iter_blocks(results))
+
+    def _lookup_timings(self, start: float, end: float) -> WordTimings:
+        """Finder timings i et tidsinterval ud fra de rå resultater"""
         if not self._raw_results:
-            print("### Ingen raw_results tilgængelige")
-            return srt_items
-                
+            return WordTimings(self._strings)
+        # Timing-listen og indekset bygges kun én gang pr. sæt resultater
+        if self._timing_index is None:
+            logger.debug("Bygger timing data...")
+            self._timings = build_timings(self._raw_results, self._strings)
+            self._timing_index = TimingIndex(self._timings)
+            logger.debug("Byggede %d timing elementer", len(self._timings))
+        return self._timing_index.window(start, end)
+
+    def split_long_subtitles(self, srt_items: List[Subtitle]) -> List[Subtitle]:
+        """Del lange undertekster i mindre blokke baseret på kommaer og syntaks"""
         new_items = []
         
-        # Først bygger vi en komplet liste af alle ord og deres timings
-        print("\n### Bygger timing data...")
-        all_timings = []
-        for item in self._raw_results:
-            if item["type"] == "word" or item["type"] == "punctuation":
-                timing = {
-                    "word": item["alternatives"][0]["content"],
-                    "start": item["start_time"],
-                    "end": item.get("end_time", item["start_time"]),
-                    "type": item["type"]
-                }
-                if item.get("attaches_to") == "previous":
-                    timing["attaches_to"] = "previous"
-                all_timings.append(timing)
-        
-        print(f"Byggede {len(all_timings)} timing elementer")
-        
-        # Process each subtitle
+        # Første gennemløb: find timing data for alle lange undertekster
+        plans = []  # (undertekst, segment_timings) - timings er None hvis teksten beholdes
         for item in srt_items:
             if item.index == 1:  # Keep metadata
-                new_items.append(item)
+                plans.append((item, None))
                 continue
             
-            duration_sec = (item.end.ordinal - item.start.ordinal) / 1000.0
-            print(f"\nUndertekst {item.index}: '{item.text[:50]}...' ({duration_sec:.1f} sek)")
-            
+            duration_sec = (item.end_ms - item.start_ms) / 1000.0
             if duration_sec <= self.config.max_subtitle_duration_sec:
-                print(f"  Undertekst er kort nok ({duration_sec:.1f} ≤ {self.config.max_subtitle_duration_sec:.1f})")
-                new_items.append(item)
+                logger.debug("Undertekst %d er kort nok (%.1f ≤ %.1f sek)",
+                             item.index, duration_sec, self.config.max_subtitle_duration_sec)
+                plans.append((item, None))
                 continue
                 
-            print(f"  Undertekst er for lang ({duration_sec:.1f} > {self.config.max_subtitle_duration_sec:.1f})")
-            
-            # Find alle timings der falder inden for denne underteksts tidsinterval
-            subtitle_start = item.start.ordinal / 1000.0  # Konverter til sekunder
-            subtitle_end = item.end.ordinal / 1000.0
+            logger.debug("Undertekst %d er for lang (%.1f > %.1f sek): '%.50s...'",
+                         item.index, duration_sec, self.config.max_subtitle_duration_sec, item.text)
             
-            segment_timings = []
-            for timing in all_timings:
-                if (timing["start"] >= subtitle_start - 0.1 and  # Tillad 100ms tolerance
-                    timing["end"] <= subtitle_end + 0.1):
-                    segment_timings.append(timing)
+            # Brug blokkens egne timings fra process_results hvis de findes, ellers slå tidsintervallet op
+            # i indekset. Blokkens timings har ikke vinduets tolerance på 100 ms, så tegnsætning fra den
+            # forrige sætning kommer ikke med, og kommaers varighed måles fra blokkens eget første ord.
+            segment_timings = item.timings
+            if segment_timings is None:
+                segment_timings = self._lookup_timings(item.start_ms / 1000.0, item.end_ms / 1000.0)
             
             if not segment_timings:
-                print("  ADVARSEL: Kunne ikke finde timing data for teksten!")
+                logger.warning("Kunne ikke finde timing data for undertekst %d", item.index)
+                plans.append((item, None))
+                continue
+            
+            plans.append((item, segment_timings))
+        
+        # Parse alle segmenter der skal deles syntaktisk i én samlet kørsel
+        split_plans = [(item, timings) for item, timings in plans if timings is not None]
+        docs = self.parse_segments([timings for _, timings in split_plans])
+        doc_for = {id(item): doc for (item, _), doc in zip(split_plans, docs)}
+        
+        # Andet gennemløb: del teksterne
+        for item, segment_timings in plans:
+            if segment_timings is None:
                 new_items.append(item)
                 continue
             
-            print(f"  Fandt {len(segment_timings)} timing elementer mellem {subtitle_start:.2f}s og {subtitle_end:.2f}s")
-            split_points = self.find_split_points(segment_timings, self.config.max_subtitle_duration_sec)
-            print(f"  Fandt {len(split_points)} split points: {split_points}")
+            subtitle_start = item.start_ms / 1000.0  # Konverter til sekunder
+            subtitle_end = item.end_ms / 1000.0
+            
+            logger.debug("Fandt %d timing elementer mellem %.2fs og %.2fs",
+                         len(segment_timings), subtitle_start, subtitle_end)
+            split_points = self.select_split_points(segment_timings, self.config.max_subtitle_duration_sec, doc_for[id(item)])
+            logger.debug("Fandt %d split points: %s", len(split_points), split_points)
             
             if not split_points:
                 new_items.append(item)
@@ -351,8 +873,8 @@ class SRTGenerator:
                     continue
                     
                 text = self.build_text_from_timings(segment)
-                segment_duration = segment[-1]["end"] - segment[0]["start"]
-                print(f"  Deler segment {i+1}: '{text}' ({segment_duration:.1f} sek)")
+                logger.debug("Deler segment %d: '%s' (%.1f sek)",
+                             i + 1, text, segment.ends[-1] - segment.starts[0])
                     
                 # Tilføj bindestreger for fortsættelse
                 if start_idx > 0:
@@ -365,24 +887,20 @@ class SRTGenerator:
                         text = text[:-1]  # Fjern kommaet
                     text += " -"
                     
-                start_time = segment[0]["start"]
-                end_time = segment[-1]["end"]
+                start_time = segment.starts[0]
+                end_time = segment.ends[-1]
                     
                 # Sikr at timing er inden for original underteksts grænser
                 start_time = max(start_time, subtitle_start)
                 end_time = min(end_time, subtitle_end)
                     
-                new_item = pysrt.SubRipItem(
+                new_items.append(Subtitle(
                     index=len(new_items) + 1,
-                    start=pysrt.SubRipTime(milliseconds=int(start_time * 1000)),
-                    end=pysrt.SubRipTime(milliseconds=int(end_time * 1000)),
-                    text=text
-                )
-                    
-                if hasattr(item, 'speaker'):
-                    new_item.speaker = item.speaker
-                    
-                new_items.append(new_item)
+                    start_ms=int(start_time * 1000),
+                    end_ms=int(end_time * 1000),
+                    text=text,
+                    speaker=item.speaker
+                ))
                 start_idx = split_idx
             
             # Håndter sidste segment hvis nødvendigt
@@ -390,31 +908,26 @@ class SRTGenerator:
                 segment = segment_timings[start_idx:]
                 if segment:  # Sikr at vi har noget at arbejde med
                     text = self.build_text_from_timings(segment)
-                    segment_duration = segment[-1]["end"] - segment[0]["start"]
-                    print(f"  Sidste segment: '{text}' ({segment_duration:.1f} sek)")
+                    logger.debug("Sidste segment: '%s' (%.1f sek)", text, segment.ends[-1] - segment.starts[0])
                     
                     # Tilføj bindestreger for sidste del
                     if start_idx > 0:
                         text = "- " + text
                         
-                    start_time = segment[0]["start"]
-                    end_time = segment[-1]["end"]
+                    start_time = segment.starts[0]
+                    end_time = segment.ends[-1]
                         
                     # Sikr at timing er inden for original underteksts grænser
                     start_time = max(start_time, subtitle_start)
                     end_time = min(end_time, subtitle_end)
                         
-                    new_item = pysrt.SubRipItem(
+                    new_items.append(Subtitle(
                         index=len(new_items) + 1,
-                        start=pysrt.SubRipTime(milliseconds=int(start_time * 1000)),
-                        end=pysrt.SubRipTime(milliseconds=int(end_time * 1000)),
-                        text=text
-                    )
-                        
-                    if hasattr(item, 'speaker'):
-                        new_item.speaker = item.speaker
-                        
-                    new_items.append(new_item)
+                        start_ms=int(start_time * 1000),
+                        end_ms=int(end_time * 1000),
+                        text=text,
+                        speaker=item.speaker
+                    ))
             
         # Renummerér undertekster
         for i, item in enumerate(new_items, start=1):
@@ -422,30 +935,41 @@ class SRTGenerator:
             
         return new_items
     
-    def merge_subtitles(self, srt_items: List[pysrt.SubRipItem]) -> List[pysrt.SubRipItem]:
-        """Slår korte undertekster sammen"""
-        if not srt_items:
-            return []
-            
-        merged_items = [srt_items[0]]  # Behold metadata
+    def iter_merged(self, srt_items: Iterable[Subtitle]) -> Iterator[Subtitle]:
+        """Slår korte undertekster sammen med kun én undertekst i venteposition"""
+        prev_item = None  # Den første (metadata) kan ikke få andre lagt sammen med sig
         
-        for item in srt_items[1:]:
-            prev_item = merged_items[-1]
+        for item in srt_items:
+            if prev_item is None:
+                prev_item = item
+                continue
             
+            # Metadata har ingen taler og slås derfor aldrig sammen
             same_speaker = (
-                hasattr(item, 'speaker') and 
-                hasattr(prev_item, 'speaker') and 
+                item.speaker is not None and 
                 item.speaker == prev_item.speaker
             )
             
-            gap_ms = item.start.ordinal - prev_item.end.ordinal
-            duration_sec = (item.end.ordinal - prev_item.start.ordinal) / 1000
+            duration_sec = (item.end_ms - prev_item.start_ms) / 1000
             
             if same_speaker and duration_sec <= self.config.merge_threshold_sec:
                 prev_item.text = f"{prev_item.text} {item.text}"
-                prev_item.end = item.end
+                prev_item.end_ms = item.end_ms
+                # Sammenlagte blokke er naboer, så deres timings kan blot sættes efter hinanden
+                if prev_item.timings is not None and item.timings is not None:
+                    prev_item.timings.extend(item.timings)
+                else:
+                    prev_item.timings = None
             else:
-                merged_items.append(item)
+                yield prev_item
+                prev_item = item
+        
+        if prev_item is not None:
+            yield prev_item
+
+    def merge_subtitles(self, srt_items: List[Subtitle]) -> List[Subtitle]:
+        """Slår korte undertekster sammen"""
+        merged_items = list(self.iter_merged(srt_items))
         
         # Renummerér undertekster
         for i, item in enumerate(merged_items, start=1):
@@ -453,27 +977,67 @@ class SRTGenerator:
             
         return merged_items
 
-    def extend_subtitle_end_time(self, srt_items: List[pysrt.SubRipItem], max_extension_sec: float = 1.0) -> List[pysrt.SubRipItem]:
-        """Forlænger udtiden og sikrer 4-frames mellemrum mellem tekster."""
+    def iter_extended(self, srt_items: Iterable[Subtitle], max_extension_sec: float = 1.0) -> Iterator[Subtitle]:
+        """Forlænger udtiden og sikrer 4-frames mellemrum, med kun én undertekst i venteposition"""
         min_gap_ms = self.config.min_gap_ms
         max_gap_ms = 1000  # 25 frames
+        current = None
+
+        for next_item in srt_items:
+            if current is not None:
+                extended_end_ms = current.end_ms + int(max_extension_sec * 1000)
+                max_allowed_end_ms = next_item.start_ms - min_gap_ms
+                current_gap = next_item.start_ms - current.end_ms
+
+                if current_gap < min_gap_ms:
+                    current.end_ms = next_item.start_ms - min_gap_ms
+                elif min_gap_ms <= current_gap <= max_gap_ms:
+                    current.end_ms = next_item.start_ms - min_gap_ms
+                elif extended_end_ms <= max_allowed_end_ms:
+                    current.end_ms = extended_end_ms
+                yield current
+            current = next_item
+
+        if current is not None:
+            yield current
+
+    def extend_subtitle_end_time(self, srt_items: List[Subtitle], max_extension_sec: float = 1.0) -> List[Subtitle]:
+        """Forlænger udtiden og sikrer 4-frames mellemrum mellem tekster."""
+        return list(self.iter_extended(srt_items, max_extension_sec))
 
-        for i in range(len(srt_items) - 1):
-            current = srt_items[i]
-            next_item = srt_items[i + 1]
+    def iter_subtitles(self, results: Iterable[Dict], metadata_item: Subtitle) -> Iterator[Subtitle]:
+        """
+        Streaming-udgave af hele segmenteringen: undertekster sendes videre efterhånden som
+        resultaterne læses, og kun ord-timings for de undertekster der er under behandling holdes i hukommelsen.
+        """
+        def with_metadata():
+            yield metadata_item
+            yield from self.iter_blocks(results)
 
-            extended_end_ms = current.end.ordinal + int(max_extension_sec * 1000)
-            max_allowed_end_ms = next_item.start.ordinal - min_gap_ms
-            current_gap = next_item.start.ordinal - current.end.ordinal
+        max_duration_ms = self.config.max_subtitle_duration_sec * 1000
 
-            if current_gap < min_gap_ms:
-                current.end = pysrt.SubRipTime(milliseconds=next_item.start.ordinal - min_gap_ms)
-            elif min_gap_ms <= current_gap <= max_gap_ms:
-                current.end = pysrt.SubRipTime(milliseconds=next_item.start.ordinal - min_gap_ms)
-            elif extended_end_ms <= max_allowed_end_ms:
-                current.end = pysrt.SubRipTime(milliseconds=extended_end_ms)
+        def split_in_batches(items):
+            # Undertekster holdes tilbage, til der er en fuld spaCy-batch af segmenter der skal parses
+            # (eller look-ahead-grænsen er nået), så nlp.pipe ikke kaldes med få tekster ad gangen
+            batch = []
+            to_parse = 0
+            for item in items:
+                batch.append(item)
+                if (item.index != 1 and item.timings and item.end_ms - item.start_ms > max_duration_ms
+                        and self._needs_parse(item.timings)):
+                    to_parse += 1
+                if to_parse >= self.config.spacy_batch_size or len(batch) >= self.config.spacy_max_lookahead:
+                    yield from self.split_long_subtitles(batch)
+                    batch = []
+                    to_parse = 0
+            if batch:
+                yield from self.split_long_subtitles(batch)
 
-        return srt_items
+        merged = self.iter_merged(with_metadata())
+        for index, item in enumerate(self.iter_extended(split_in_batches(merged)), start=1):
+            item.index = index
+            item.timings = None  # Timings skal ikke leve længere end selve segmenteringen
+            yield item
 
 
 def segment_json(json_data: Dict[str, Any],
@@ -512,7 +1076,8 @@ def segment_json(json_data: Dict[str, Any],
         if progress_callback:
             progress_callback("Segmentering færdig")
             
-        return srt_items
+        # Konverter først til pysrt ved udgangen
+        return [item.to_pysrt() for item in srt_items]
         
     except Exception as e:
         if progress_callback:
@@ -520,9 +1085,46 @@ def segment_json(json_data: Dict[str, Any],
         return None
 
 
+def segment_json_stream(json_path: str,
+                        config: Optional[Dict] = None,
+                        progress_callback: Optional[Callable[[str], None]] = None) -> Iterator[Subtitle]:
+    """
+    Segmenterer en json-v2 fil til SRT som en generator uden at indlæse hele filen.
+    Metadata-underteksten laves ud fra job/metadata, der i json-v2 står før results.
+    Underteksterne kan skrives direkte med write_srt eller konverteres med Subtitle.to_pysrt.
+    """
+    if progress_callback:
+        progress_callback("Starter streaming-segmentering af JSON...")
+        
+    generator = SRTGenerator(SegmentConfig(**(config or {})))
+    header: Dict[str, Any] = {}
+    results = iter_json_results(json_path, header)
+
+    # Læs første resultat, så job og metadata er kendt før metadata-underteksten laves
+    first = next(results, None)
+    metadata_item = generator.generate_metadata_subtitle(header)
+
+    def all_results():
+        if first is not None:
+            yield first
+            yield from results
+
+    if progress_callback:
+        progress_callback("Behandler resultater...")
+    count = 0
+    for item in generator.iter_subtitles(all_results(), metadata_item):
+        count += 1
+        yield item
+
+    if progress_callback:
+        progress_callback(f"Segmentering færdig ({count} undertekster)")
+
+
 if __name__ == "__main__":
     import sys
     
+    logging.basicConfig(format="%(message)s")
+
     def print_progress(msg: str):
         print(msg)
     
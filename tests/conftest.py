@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# Modulerne ligger i roden af repoet og er ikke en pakke
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Caches og jobfil med relative stier havner i en midlertidig datamappe i stedet for brugerens"""
+    path = tmp_path / "data"
+    monkeypatch.setenv("DRGENSYN_DATA_DIR", str(path))
+    return path
@@ -0,0 +1,300 @@
+import json
+import sys
+import time
+
+import httpx
+import pytest
+from speechmatics.exceptions import JobNotFoundException
+
+import DrGenkend
+
+
+class FakeBatchClient:
+    """
+    Speechmatics-attrap: jobs i `jobs` er færdige, jobs i `running` kører stadig,
+    og alle andre findes ikke (som et udløbet job)
+    """
+    jobs = {}
+    running = set()
+    submitted = []
+    deleted = []
+
+    def __init__(self, settings):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def submit_job(self, audio, transcription_config):
+        job_id = f"NEW{len(self.submitted)}"
+        self.submitted.append(job_id)
+        self.jobs[job_id] = {"results": [], "job": {"id": job_id}}
+        return job_id
+
+    def check_job_status(self, job_id):
+        if job_id in self.running:
+            return {"job": {"status": "running"}}
+        if job_id not in self.jobs:
+            raise JobNotFoundException(f"Job {job_id} not found")
+        return {"job": {"status": "done"}}
+
+    def delete_job(self, job_id, force=False):
+        self.deleted.append(job_id)
+        self.running.discard(job_id)
+        return f"Job {job_id} deleted"
+
+    def get_job_result(self, job_id, transcription_format="json-v2"):
+        if job_id not in self.jobs:
+            raise JobNotFoundException(f"Could not find job {job_id}")
+        return self.jobs[job_id]
+
+
+@pytest.fixture
+def recognizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(DrGenkend, "BatchClient", FakeBatchClient)
+    monkeypatch.setattr(FakeBatchClient, "jobs", {})
+    monkeypatch.setattr(FakeBatchClient, "running", set())
+    monkeypatch.setattr(FakeBatchClient, "submitted", [])
+    monkeypatch.setattr(FakeBatchClient, "deleted", [])
+    config = DrGenkend.RecognitionConfig(
+        api_key="test",
+        stream_upload=False,
+        transcript_cache_dir=str(tmp_path / "cache"),
+        job_store_path=str(tmp_path / "jobs.json")
+    )
+    return DrGenkend.SpeechRecognizer(config)
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / "optagelse_16k.flac"  # Har allerede profilens endelse, så ffmpeg ikke bruges
+    path.write_bytes(b"lyd" * 1000)
+    return str(path)
+
+
+def store_job(recognizer, media, job_id):
+    config_dict = recognizer.config.to_dict()
+    media_hash = DrGenkend.media_fingerprint(media)
+    recognizer.jobs.add(job_id, DrGenkend.TranscriptCache.make_key(media_hash, config_dict),
+                        media, media_hash, config_dict)
+
+
+def test_default_stores_are_kept_in_data_dir(data_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    recognizer = DrGenkend.SpeechRecognizer(DrGenkend.RecognitionConfig(api_key="test"))
+
+    assert recognizer.cache.directory == str(data_dir / "drgenkend_cache")
+    assert (data_dir / "drgenkend_cache").is_dir()
+    assert not (tmp_path / "drgenkend_cache").exists()
+
+    recognizer.jobs.add("JOB", "nøgle", "optagelse.mp4", "hash", {})
+    assert recognizer.jobs.path == str(data_dir / "drgenkend_jobs.json")
+    assert (data_dir / "drgenkend_jobs.json").exists()
+    assert not (tmp_path / "drgenkend_jobs.json").exists()
+
+
+def test_job_store_loses_no_jobs_with_concurrent_writers(tmp_path):
+    # To lagre på samme fil svarer til GUI'en og --resume i hver sin proces
+    stores = [DrGenkend.JobStore(str(tmp_path / "jobs.json")) for _ in range(2)]
+
+    def add_jobs(store, prefix):
+        for i in range(25):
+            store.add(f"{prefix}-{i}", "nøgle", "optagelse.mp4", "hash", {})
+
+    with DrGenkend.ThreadPoolExecutor(max_workers=4) as executor:
+        for future in [executor.submit(add_jobs, stores[n % 2], f"job{n}") for n in range(4)]:
+            future.result()
+
+    assert len(stores[0].pending()) == 100
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["jobs.json"]
+
+
+def test_wait_for_raises_job_failed_for_missing_job(recognizer):
+    with pytest.raises(DrGenkend.JobFailed):
+        recognizer.poller.wait_for("OLDJOB")
+
+
+def test_missing_stored_job_is_dropped_and_resubmitted(recognizer, media):
+    store_job(recognizer, media, "OLDJOB")
+
+    transcript = recognizer.run_recognition(media)
+
+    assert transcript == {"results": [], "job": {"id": "NEW0"}}
+    assert FakeBatchClient.submitted == ["NEW0"]
+    assert recognizer.jobs.pending() == {}
+
+
+def test_finished_stored_job_is_resumed_without_resubmitting(recognizer, media):
+    FakeBatchClient.jobs["RUNNING"] = {"results": [], "job": {"id": "RUNNING"}}
+    store_job(recognizer, media, "RUNNING")
+
+    transcript = recognizer.run_recognition(media)
+
+    assert transcript["job"]["id"] == "RUNNING"
+    assert FakeBatchClient.submitted == []
+    assert recognizer.jobs.pending() == {}
+
+
+def test_resume_pending_jobs_drops_missing_job(recognizer, media, tmp_path, monkeypatch):
+    store_job(recognizer, media, "OLDJOB")
+    monkeypatch.chdir(tmp_path)
+    config = {
+        "api_key": "test",
+        "transcript_cache_dir": recognizer.config.transcript_cache_dir,
+        "job_store_path": recognizer.config.job_store_path
+    }
+
+    assert DrGenkend.resume_pending_jobs(config) == 0
+    assert json.loads((tmp_path / "jobs.json").read_text()) == {}
+
+
+class FakeStream:
+    filename = "del.flac"
+    bytes_read = 0
+
+    def close(self):
+        return True
+
+
+def test_chunk_failure_stops_other_chunks_without_waiting(recognizer, media, monkeypatch):
+    monkeypatch.setattr(DrGenkend.AudioConverter, "detect_silences", staticmethod(lambda path: (3000.0, [])))
+    monkeypatch.setattr(DrGenkend.AudioConverter, "open_stream", staticmethod(lambda *args: FakeStream()))
+    recognizer.config.chunk_minutes = 10
+    recognizer.poller.interval = 30  # Uden stop-signalet ville de andre dele vente mindst et helt interval
+
+    def submit_job(self, audio, transcription_config):
+        job_id = f"DEL{len(self.submitted)}"
+        self.submitted.append(job_id)
+        if job_id == "DEL0":
+            return job_id  # Findes ikke ved første statuskald, så delen fejler
+        self.running.add(job_id)
+        return job_id
+
+    monkeypatch.setattr(FakeBatchClient, "submit_job", submit_job)
+    config_dict = recognizer.config.to_dict()
+    media_hash = DrGenkend.media_fingerprint(media)
+    key = DrGenkend.TranscriptCache.make_key(media_hash, config_dict)
+
+    start = time.perf_counter()
+    assert recognizer._run_chunked(media, config_dict, media_hash, key) is None
+    assert time.perf_counter() - start < 5
+
+    # De igangværende jobs slettes i baggrunden, og ingen nye dele sendes
+    deadline = time.monotonic() + 5
+    while FakeBatchClient.running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert FakeBatchClient.running == set()
+    assert sorted(FakeBatchClient.deleted) == sorted(set(FakeBatchClient.submitted) - {"DEL0"})
+    assert len(FakeBatchClient.submitted) <= recognizer.config.max_parallel_jobs
+
+
+def test_streamed_upload_is_not_resent_after_protocol_error():
+    from speechmatics.batch_client import BatchClient, HttpClient
+    from speechmatics.models import ConnectionSettings
+
+    calls = []
+
+    def handler(request):
+        calls.append(len(request.content))
+        raise httpx.RemoteProtocolError("Server disconnected without sending a response.")
+
+    command = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'x' * 300000)"]
+    stream = DrGenkend.FfmpegStream(command, "optagelse_16k.ogg")
+    client = BatchClient(ConnectionSettings(url="https://asr.example/v2", auth_token="test"))
+    client.api_client = HttpClient(base_url="https://asr.example/v2", transport=httpx.MockTransport(handler))
+
+    # SDK'ets genforsøg ville ellers sende den tomme rest af pipen som en ny, afkortet fil
+    with pytest.raises(DrGenkend.StreamRewindError):
+        client.submit_job(audio=(stream.filename, stream), transcription_config={"type": "transcription"})
+    assert len(calls) == 1
+    assert calls[0] > 300000
+    stream.close()
+
+
+def spoken(duration=60.0):
+    """json-v2 med et ord hvert halve sekund og punktum efter hvert femte: S1 til 20 s, S2 til 40 s, derefter S3"""
+    results = []
+    for k in range(int(duration * 2)):
+        start = k * 0.5
+        speaker = "S1" if start < 20 else "S2" if start < 40 else "S3"
+        results.append({"type": "word", "start_time": start, "end_time": start + 0.4,
+                        "alternatives": [{"content": f"ord{k}", "speaker": speaker}]})
+        if k % 5 == 4:
+            results.append({"type": "punctuation", "start_time": start + 0.4, "end_time": start + 0.4,
+                            "attaches_to": "previous", "is_eos": True,
+                            "alternatives": [{"content": ".", "speaker": speaker}]})
+    return {"job": {"id": "HEL"}, "results": results}
+
+
+def chunk_transcript(full, chunk):
+    """Det Speechmatics ville returnere for delen: tider fra delens start og talere nummereret forfra"""
+    labels = {}
+    results = []
+    for item in full["results"]:
+        if not chunk.start <= item["start_time"] < chunk.end:
+            continue
+        speaker = item["alternatives"][0]["speaker"]
+        labels.setdefault(speaker, f"S{len(labels) + 1}")
+        results.append(dict(item, start_time=round(item["start_time"] - chunk.start, 2),
+                            end_time=round(item["end_time"] - chunk.start, 2),
+                            alternatives=[dict(item["alternatives"][0], speaker=labels[speaker])]))
+    return {"job": {"id": f"DEL{chunk.index}"}, "results": results}
+
+
+def test_stitched_chunks_match_single_transcript():
+    full = spoken()
+    chunks = DrGenkend.plan_chunks(60.0, [(33.0, 34.0)], chunk_sec=30.0, overlap_sec=10.0)
+    assert [(chunk.start, chunk.keep_from, chunk.keep_to) for chunk in chunks] == [(0.0, 0.0, 33.5), (23.5, 33.5, 60.0)]
+    transcripts = [chunk_transcript(full, chunk) for chunk in chunks]
+    # I den anden del er S2 den første taler, så Speechmatics kalder S2 for S1 og S3 for S2
+    assert transcripts[1]["results"][0]["alternatives"][0]["speaker"] == "S1"
+
+    stitched = DrGenkend.stitch_transcripts(chunks, transcripts)
+
+    def words(transcript):
+        return [(item["alternatives"][0]["content"], round(item["start_time"], 2), item["alternatives"][0]["speaker"])
+                for item in transcript["results"]]
+    # Ingen dubletter eller huller ved snittet, og S3 der ikke taler i overlappet får et nyt label
+    assert words(stitched) == words(full)
+    assert stitched["job"]["duration"] == 60.0
+
+
+def test_cache_hits_same_media_and_misses_changed_config(recognizer, media, tmp_path):
+    first = recognizer.run_recognition(media)
+    assert FakeBatchClient.submitted == ["NEW0"]
+
+    # Samme indhold under et andet navn hentes fra cachen
+    copy = tmp_path / "kopi_16k.flac"
+    copy.write_bytes((tmp_path / "optagelse_16k.flac").read_bytes())
+    assert recognizer.run_recognition(media) == first
+    assert recognizer.run_recognition(str(copy)) == first
+    assert FakeBatchClient.submitted == ["NEW0"]
+
+    # En anden Speechmatics-konfiguration giver en ny nøgle og et nyt job
+    recognizer.config.operating_point = "standard"
+    recognizer.run_recognition(media)
+    assert FakeBatchClient.submitted == ["NEW0", "NEW1"]
+
+    # Ændret indhold giver også et nyt job
+    copy.write_bytes(b"anden lyd" * 1000)
+    recognizer.run_recognition(str(copy))
+    assert FakeBatchClient.submitted == ["NEW0", "NEW1", "NEW2"]
+
+
+def test_media_fingerprint_samples_large_files(tmp_path):
+    path = tmp_path / "stor.flac"
+    data = bytearray(b"x" * 10000)
+    path.write_bytes(bytes(data))
+    original = DrGenkend.media_fingerprint(str(path), sample_size=100, samples=4)
+
+    data[0] = ord("y")  # Ligger i den første prøve
+    path.write_bytes(bytes(data))
+    assert DrGenkend.media_fingerprint(str(path), sample_size=100, samples=4) != original
+
+    data[0] = ord("x")
+    data[5000] = ord("y")  # Ligger mellem prøverne, så kun størrelsen og prøverne tæller
+    path.write_bytes(bytes(data))
+    assert DrGenkend.media_fingerprint(str(path), sample_size=100, samples=4) == original
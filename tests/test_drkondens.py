@@ -0,0 +1,259 @@
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError, InternalServerError, RateLimitError
+
+import DrKondens
+from DrKondens import LocalCondenser, fits_lines
+
+
+@pytest.fixture
+def condenser():
+    return LocalCondenser(chars_per_line=37, lines=2)
+
+
+def test_fits_lines():
+    assert fits_lines("kort tekst", 37)
+    assert fits_lines("det her er en tekst der skal deles på to linjer", 37)
+    assert not fits_lines("- og derfor mener regeringen at konkurrenceudsættelsesstrategien er god -", 37)
+
+
+def test_unsplittable_text_within_max_chars_is_left_to_gpt(condenser):
+    text = "- og derfor mener regeringen at konkurrenceudsættelsesstrategien er god -"
+    assert len(text) <= condenser.max_chars
+    assert condenser.condense(text) is None
+
+
+def test_unchanged_text_is_not_a_local_result(condenser):
+    assert condenser.condense("Det passer fint på to linjer.") is None
+
+
+@pytest.mark.parametrize("text", [
+    "Sådan er det bare, og det har det altid været i hele landet og hele verden.",
+    "Vi har jo egentlig bare sådan ventet på at regeringen ville gøre noget ved det.",
+    "Det er lige præcis det det handler om, når vi taler om klimaet i dag, ikke",
+    "Jo, det har vi faktisk gjort i mange år, og det vil vi blive ved med at gøre",
+])
+def test_meaning_bearing_adverbs_are_kept(condenser, text):
+    # Uden indskud er der intet lokalt at fjerne - "Sådan er det bare" må ikke blive til "Er det bare",
+    # "det det handler om" er ikke en fejlstart, og "Jo," er et svar
+    assert not fits_lines(text, 37)
+    result = condenser.condense(text)
+    # Kun de tilladte sammentrækninger må bruges
+    assert result is None or result.replace("Det's", "Det er") == text
+
+
+@pytest.mark.parametrize("text", [
+    "Jeg, jeg tror ikke at vi kommer til at se den slags igen i rigtig mange år",
+    "Jeg øh jeg tror ikke at vi kommer til at se den slags igen i rigtig mange år",
+])
+def test_false_starts_are_removed(condenser, text):
+    assert not fits_lines(text, 37)
+    assert condenser.condense(text) == "Jeg tror ikke at vi kommer til at se den slags igen i rigtig mange år"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Altså, det her er noget vi har talt rigtig meget om i hele udvalget i hele år",
+     "Det her er noget vi har talt rigtig meget om i hele udvalget i hele år"),
+    ("Det var, altså, noget vi alle sammen havde set komme i rigtig lang tid nu her",
+     "Det var noget vi alle sammen havde set komme i rigtig lang tid nu her"),
+    ("Vi skal øh have fundet en løsning på det her problem inden næste sommer her",
+     "Vi skal have fundet en løsning på det her problem inden næste sommer her"),
+])
+def test_interjections_are_removed(condenser, text, expected):
+    assert not fits_lines(text, 37)
+    assert condenser.condense(text) == expected
+
+
+@pytest.fixture
+def text_condenser(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_AZURE_ENDPOINT", "http://127.0.0.1:9")
+    monkeypatch.setenv("OPENAI_AZURE_API_KEY", "test")
+    config = DrKondens.CondensationConfig(
+        chars_per_line=37,
+        prompt_batch_size=4,
+        max_concurrency=1,
+        local_condensation=False,
+        cache_path=str(tmp_path / "cache.sqlite")
+    )
+    condenser = DrKondens.TextCondenser(config)
+    yield condenser
+    condenser.close()
+
+
+def test_texts_failing_in_prompt_batch_are_counted_once_in_cache(text_condenser, monkeypatch):
+    texts = [f"Tekst nummer {i} der er alt for lang til at stå på to linjer i en undertekst her" for i in range(6)]
+    # Det samlede kald fejler for alle tekster, så de spørges enkeltvis
+    monkeypatch.setattr(text_condenser, "get_condensations_batched", lambda batch, temperature: [None] * len(batch))
+    monkeypatch.setattr(text_condenser, "collect_proposals", lambda text, *args: [f"Kort {text.split()[2]}."])
+
+    result = text_condenser.condense_text_batch(texts)
+
+    assert result == [f"Kort {i}." for i in range(6)]
+    stats = text_condenser.get_stats()
+    assert stats["cache_misses"] == len(texts)
+    assert stats["cache_hits"] == 0
+
+
+class LockedConnection:
+    """Forbindelse hvor al skrivning fejler, som når en anden instans holder databasen låst"""
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, *args):
+        if not sql.startswith("SELECT"):
+            raise sqlite3.OperationalError("database is locked")
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def test_locked_cache_does_not_discard_results(text_condenser, monkeypatch):
+    texts = [f"Tekst nummer {i} der er alt for lang til at stå på to linjer i en undertekst her" for i in range(4)]
+    monkeypatch.setattr(text_condenser.cache, "_conn", LockedConnection(text_condenser.cache._conn))
+    # Halvdelen klares i det samlede kald, resten spørges enkeltvis
+    monkeypatch.setattr(text_condenser, "get_condensations_batched",
+                        lambda batch, temperature: [f"Samlet {t.split()[2]}." if int(t.split()[2]) % 2 else None
+                                                    for t in batch])
+    monkeypatch.setattr(text_condenser, "collect_proposals", lambda text, *args: [f"Enkelt {text.split()[2]}."])
+
+    result = text_condenser.condense_text_batch(texts)
+
+    assert result == ["Enkelt 0.", "Samlet 1.", "Enkelt 2.", "Samlet 3."]
+    assert text_condenser.get_stats()["cache_misses"] == len(texts)
+
+
+def test_relative_cache_path_is_kept_in_data_dir(data_dir, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = DrKondens.CondensationCache(DrKondens.CondensationConfig(chars_per_line=37).cache_path)
+    cache.close()
+    assert cache.path == str(data_dir / "drkondens_cache.sqlite")
+    assert (data_dir / "drkondens_cache.sqlite").exists()
+    assert not (tmp_path / "drkondens_cache.sqlite").exists()
+
+
+class FakeClock:
+    """Erstatter time i DrKondens: monotonic styres af testen, og sleep rykker uret frem i stedet for at vente"""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(DrKondens, "time", fake)
+    # Fuld backoff i stedet for tilfældig jitter
+    monkeypatch.setattr(DrKondens.random, "uniform", lambda low, high: high)
+    return fake
+
+
+def api_error(error_class, status, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://127.0.0.1:9"))
+    return error_class("fejl", response=response, body=None)
+
+
+def failing(errors, result="svar"):
+    """Kaldet fejler med fejlene i rækkefølge og lykkes derefter. Brugte fejl fjernes fra listen."""
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+def test_scheduler_waits_retry_after_and_pauses_other_calls(clock):
+    scheduler = DrKondens.RequestScheduler(requests_per_minute=600, tokens_per_minute=100000)
+
+    result = scheduler.call(failing([api_error(RateLimitError, 429, {"retry-after": "7"})]), tokens=10)
+
+    assert result == "svar"
+    assert clock.sleeps == [7.0]  # Retry-After vejer tungere end backoff på 1 sek
+    assert scheduler.retries == 1
+    # Kvoten deles, så kald fra andre tråde holdes også tilbage til pausen er ovre
+    assert scheduler._paused_until == 1007.0
+
+
+def test_scheduler_backoff_is_capped_and_gives_up(clock):
+    scheduler = DrKondens.RequestScheduler(requests_per_minute=600, tokens_per_minute=100000,
+                                           max_retries=6, base_delay=1.0, max_delay=5.0)
+    errors = [api_error(InternalServerError, 500) for _ in range(7)]
+
+    with pytest.raises(InternalServerError):
+        scheduler.call(failing(errors), tokens=10)
+
+    assert clock.sleeps == [1.0, 2.0, 4.0, 5.0, 5.0, 5.0]
+    assert errors == []  # Første forsøg plus seks genforsøg
+
+
+def test_scheduler_does_not_retry_client_errors(clock):
+    scheduler = DrKondens.RequestScheduler(requests_per_minute=600, tokens_per_minute=100000)
+
+    with pytest.raises(BadRequestError):
+        scheduler.call(failing([api_error(BadRequestError, 400)]), tokens=10)
+
+    assert clock.sleeps == []
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Tidsgrænse overskredet"
+        time.sleep(0.005)
+
+
+def test_scheduler_sends_first_attempts_before_fallbacks(clock):
+    scheduler = DrKondens.RequestScheduler(requests_per_minute=60, tokens_per_minute=100000)
+    scheduler._requests.level = 0  # Kvoten for det seneste minut er brugt
+    order = []
+
+    def call(name, priority):
+        scheduler.call(lambda: order.append(name), tokens=10, priority=priority)
+
+    # Fallback-kaldet står først i kø, men et førstegangsforsøg der kommer bagefter, sendes før det
+    threads = [threading.Thread(target=call, args=("fallback", DrKondens.PRIORITY_FALLBACK))]
+    threads[0].start()
+    wait_until(lambda: len(scheduler._waiting) == 1)
+    threads.append(threading.Thread(target=call, args=("first", DrKondens.PRIORITY_FIRST)))
+    threads[1].start()
+    wait_until(lambda: len(scheduler._waiting) == 2)
+
+    for expected in (1, 2):
+        clock.now += 1.0  # Ét request mere pr. sekund ved 60 RPM
+        with scheduler._cond:
+            scheduler._cond.notify_all()
+        wait_until(lambda: len(order) == expected)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == ["first", "fallback"]
+
+
+def test_cache_key_follows_validation_rules():
+    text = "En tekst der skal kondenseres"
+    default = DrKondens.CondensationConfig(chars_per_line=37)
+    explicit = DrKondens.CondensationConfig(chars_per_line=37,
+                                            validation_rules=dict(DrKondens.TextValidator.DEFAULT_RULES))
+    stricter = DrKondens.CondensationConfig(chars_per_line=37, validation_rules=dict(
+        DrKondens.TextValidator.DEFAULT_RULES, forbidden_chars=["!", ";", "-"]))
+    shorter = DrKondens.CondensationConfig(chars_per_line=37, max_chars=60)
+
+    key = DrKondens.CondensationCache.make_key(text, False, False, default)
+    assert DrKondens.CondensationCache.make_key(text, False, False, explicit) == key
+    assert DrKondens.CondensationCache.make_key(text, False, False, stricter) != key
+    assert DrKondens.CondensationCache.make_key(text, False, False, shorter) != key
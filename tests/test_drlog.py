@@ -0,0 +1,34 @@
+import logging
+import os
+import subprocess
+import sys
+
+from DrLog import get_logger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_level_is_read_from_environment(monkeypatch):
+    monkeypatch.setenv("DRTEST_LOG_LEVEL", "debug")
+    assert get_logger("DrTest").level == logging.DEBUG
+
+
+def test_unknown_level_falls_back_to_info(monkeypatch, caplog):
+    monkeypatch.setenv("DRTEST_LOG_LEVEL", "DEBUGG")
+    with caplog.at_level(logging.WARNING):
+        logger = get_logger("DrTest")
+    assert logger.level == logging.INFO
+    assert "DRTEST_LOG_LEVEL" in caplog.text
+
+
+def test_import_leaves_logging_setup_to_the_program(tmp_path):
+    # Import med et stavet forkert niveau må hverken fejle, sætte handlers op eller oprette en logfil
+    env = dict(os.environ, DRGENKEND_LOG_LEVEL="verbose", DRSEGMENT_LOG_LEVEL="dbug", PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", "import logging, DrGenkend, DrSegment; print(len(logging.getLogger().handlers))"],
+        cwd=tmp_path, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "0"
+    assert "DRGENKEND_LOG_LEVEL" in result.stderr
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,204 @@
+import json
+import random
+
+import pytest
+
+import DrSegment
+
+class FakeToken:
+    __slots__ = ("i", "dep_")
+
+    def __init__(self, i, dep):
+        self.i = i
+        self.dep_ = dep
+
+class FakeNlp:
+    """Parser-attrap: hvert fjerde ord markeres som ledsætningsmarkør. Gemmer størrelsen af hvert nlp.pipe-kald."""
+    def __init__(self):
+        self.pipe_calls = []
+
+    def __call__(self, text):
+        return [FakeToken(i, "mark" if i % 4 == 0 else "nsubj") for i in range(len(text.split()))]
+
+    def pipe(self, texts, batch_size=32, n_process=1):
+        texts = list(texts)
+        self.pipe_calls.append(len(texts))
+        return [self(text) for text in texts]
+
+@pytest.fixture
+def nlp(monkeypatch):
+    fake = FakeNlp()
+    monkeypatch.setitem(DrSegment._nlp_models, tuple(DrSegment.SPACY_MODELS), fake)
+    return fake
+
+def synthetic_transcript(seed=0, sentences=400):
+    """json-v2 med sætninger af tilfældig længde, to talere og enkelte kommaer"""
+    rng = random.Random(seed)
+    words = ("jeg tror at det er vigtigt for os alle sammen og vi skal huske på hvad der sker "
+             "i verden lige nu når vi taler om fremtiden").split()
+    results = []
+    t = 0.0
+    for _ in range(sentences):
+        n = rng.randint(3, 45)
+        speaker = rng.choice(["S1", "S2"])
+        for i in range(n):
+            duration = rng.uniform(0.15, 0.5)
+            results.append({"type": "word", "start_time": round(t, 2), "end_time": round(t + duration, 2),
+                            "alternatives": [{"content": rng.choice(words), "speaker": speaker}]})
+            t += duration + rng.uniform(0, 0.1)
+            if rng.random() < 0.08 and i < n - 1:
+                results.append({"type": "punctuation", "start_time": round(t, 2), "end_time": round(t, 2),
+                                "attaches_to": "previous", "alternatives": [{"content": ","}]})
+        results.append({"type": "punctuation", "start_time": round(t, 2), "end_time": round(t, 2),
+                        "attaches_to": "previous", "is_eos": True, "alternatives": [{"content": "."}]})
+        t += rng.uniform(0.1, 2)
+    return {"job": {"data_name": "syntetisk"}, "metadata": {}, "results": results}
+
+@pytest.fixture
+def transcript_path(tmp_path):
+    path = tmp_path / "transcript.json"
+    path.write_text(json.dumps(synthetic_transcript()), encoding="utf-8")
+    return str(path)
+
+def test_stream_matches_list_pipeline(nlp, transcript_path):
+    with open(transcript_path, encoding="utf-8") as f:
+        expected = [(item.start.ordinal, item.end.ordinal, item.text)
+                    for item in DrSegment.segment_json(json.load(f))]
+    streamed = [(item.start_ms, item.end_ms, item.text)
+                for item in DrSegment.segment_json_stream(transcript_path)]
+    assert streamed == expected
+
+def test_stream_parses_full_spacy_batches(nlp, transcript_path):
+    batch_size = 8
+    list(DrSegment.segment_json_stream(transcript_path, {"spacy_batch_size": batch_size}))
+
+    assert sum(nlp.pipe_calls) > 2 * batch_size
+    # Alle kald undtagen det sidste får en fuld batch
+    assert all(size >= batch_size for size in nlp.pipe_calls[:-1])
+
+
+@pytest.fixture
+def no_nlp(monkeypatch):
+    # Kun kommadeling, så resultatet ikke afhænger af en sprogmodel
+    monkeypatch.setitem(DrSegment._nlp_models, tuple(DrSegment.SPACY_MODELS), None)
+
+
+def word(content, start, speaker, duration=0.4):
+    return {"type": "word", "start_time": start, "end_time": round(start + duration, 2),
+            "alternatives": [{"content": content, "speaker": speaker}]}
+
+
+def punctuation(content, time, eos=False):
+    item = {"type": "punctuation", "start_time": time, "end_time": time, "attaches_to": "previous",
+            "alternatives": [{"content": content}]}
+    if eos:
+        item["is_eos"] = True
+    return item
+
+
+def question_then_long_sentence(question_mark_time, comma_time, comma_after=3):
+    """Et kort spørgsmål fra S1 efterfulgt af en sætning på 16 ord (ca. 8 s) fra S2 med ét komma"""
+    results = [word("Kommer", 0.0, "S1"), word("du", 0.5, "S1"), punctuation("?", question_mark_time, eos=True)]
+    for k in range(16):
+        results.append(word(f"ord{k}", round(1.0 + 0.5 * k, 2), "S2"))
+        if k == comma_after:
+            results.append(punctuation(",", comma_time))
+    results.append(punctuation(".", 8.9, eos=True))
+    return {"job": {}, "metadata": {}, "results": results}
+
+
+def texts(transcript):
+    return [item.text for item in DrSegment.segment_json(transcript)[1:]]
+
+
+def test_split_does_not_pick_up_previous_sentence_punctuation(no_nlp):
+    # Spørgsmålstegnet har samme tid som næste sætnings første ord. Den gamle opslag i et tidsvindue
+    # med 100 ms tolerance gav derfor "? ord0 ..." i starten af den delte undertekst.
+    transcript = question_then_long_sentence(question_mark_time=1.0, comma_time=4.0, comma_after=5)
+    assert texts(transcript) == [
+        "Kommer du?",
+        "ord0 ord1 ord2 ord3 ord4 ord5 -",
+        "- ord6 ord7 ord8 ord9 ord10 ord11 ord12 ord13 ord14 ord15.",
+    ]
+
+
+def test_comma_split_duration_is_measured_from_own_first_word(no_nlp):
+    # Kommaet ligger 1,97 s efter sætningens første ord - under min_segment_duration_sec på 2,0 s.
+    # Målt fra det forrige spørgsmålstegn (0,95 s) var det 2,02 s, og delingen blev accepteret.
+    transcript = question_then_long_sentence(question_mark_time=0.95, comma_time=2.97)
+    assert texts(transcript) == [
+        "Kommer du?",
+        "ord0 ord1 ord2 ord3, ord4 ord5 ord6 ord7 ord8 ord9 ord10 ord11 ord12 ord13 ord14 ord15.",
+    ]
+
+
+def test_write_srt_keeps_existing_file_when_generation_fails(tmp_path):
+    path = tmp_path / "output.srt"
+    path.write_text("gammel\n", encoding="utf-8")
+
+    def subtitles():
+        yield DrSegment.Subtitle(1, 0, 1000, "Første linje")
+        raise RuntimeError("afbrudt")
+
+    with pytest.raises(RuntimeError):
+        DrSegment.write_srt(subtitles(), str(path))
+
+    assert path.read_text(encoding="utf-8") == "gammel\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["output.srt"]
+
+    assert DrSegment.write_srt([DrSegment.Subtitle(1, 0, 1000, "Ny linje")], str(path)) == 1
+    assert "Ny linje" in path.read_text(encoding="utf-8")
+    assert [p.name for p in tmp_path.iterdir()] == ["output.srt"]
+
+
+def block_timings(words, step, commas_after=()):
+    """WordTimings for én blok med et ord hvert step sekund og komma efter de angivne ord"""
+    timings = DrSegment.WordTimings()
+    for k, content in enumerate(words):
+        start = round(k * step, 2)
+        timings.append(content, start, round(start + step * 0.8, 2))
+        if k in commas_after:
+            timings.append(",", round(start + step * 0.8, 2), round(start + step * 0.8, 2),
+                           punctuation=True, attached=True)
+    return timings
+
+
+def split_segments(generator, timings, splits):
+    """Teksterne og varighederne som split_long_subtitles ville lave dem, med bindestreger"""
+    bounds = [0] + list(splits) + [len(timings)]
+    segments = []
+    for start, end in zip(bounds, bounds[1:]):
+        part = timings[start:end]
+        text = generator.build_text_from_timings(part).rstrip(",")
+        text = ("- " if start > 0 else "") + text + (" -" if end < len(timings) else "")
+        segments.append((text, part.ends[-1] - part.starts[0]))
+    return segments
+
+
+def test_dp_splits_where_greedy_leaves_a_segment_too_long(no_nlp):
+    # 30 ord over 15 s med komma efter ord 4 og ord 24: den grådige motor tager det første komma
+    # og efterlader 12,5 s, mens dp-motoren deler resten ved en ordgrænse
+    timings = block_timings([f"ord{k}" for k in range(30)], 0.5, commas_after=(4, 24))
+    generator = DrSegment.SRTGenerator(DrSegment.SegmentConfig(split_engine="dp"))
+
+    greedy = split_segments(generator, timings, generator.find_split_points(timings, 7.0))
+    dp_splits = generator.find_split_points_dp(timings, 7.0)
+    dp = split_segments(generator, timings, dp_splits)
+
+    assert max(duration for _, duration in greedy) > 7.0
+    assert all(duration <= 7.0 for _, duration in dp)
+    assert all(len(text) <= 74 for text, _ in dp)
+    # Begge kommaer bruges, da grænser efter tegnsætning er gratis
+    comma_boundaries = [i + 1 for i in range(len(timings)) if timings.word(i) == ","]
+    assert set(comma_boundaries) <= set(dp_splits)
+
+
+def test_dp_respects_max_chars_for_fast_speech_with_long_words(no_nlp):
+    # 15 lange ord på 7,4 s: max 74 tegn kræver segmenter på tre-fire ord, selv om de så bliver
+    # kortere end min_segment_duration_sec. Med en for lav tegnstraf blev ét segment 75 tegn.
+    timings = block_timings(["klimaforandringerne", "sundhedsvæsenet"] * 7 + ["klimaforandringerne"], 0.5)
+    generator = DrSegment.SRTGenerator(DrSegment.SegmentConfig(split_engine="dp"))
+
+    segments = split_segments(generator, timings, generator.find_split_points_dp(timings, 7.0))
+
+    assert all(len(text) <= 74 for text, _ in segments)